@@ -1,6 +1,5 @@
-from flask import Flask, request, jsonify, render_template_string, send_file
+from flask import Flask, request, jsonify, render_template_string, send_file, Response, stream_with_context
 from flask_cors import CORS
-import requests
 import json
 import os
 from dotenv import load_dotenv
@@ -29,19 +28,30 @@ except ImportError:
     print("Warning: transformers.pipelines not available. AI features will be disabled.")
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
 from collections import Counter
-from youtube_transcript_api import YouTubeTranscriptApi
+from functools import partial
+import threading
 import re
 from PIL import Image
 import base64
 import io
-try:
-    import pytesseract
-    PYTESSERACT_AVAILABLE = True
-except ImportError:
-    PYTESSERACT_AVAILABLE = False
-    print("Warning: pytesseract not available. OCR features will be disabled.")
+from ocr_service import ocr_service, ocr_capabilities, PYTESSERACT_AVAILABLE, OCRError, OCRBusyError
+from image_upload import read_image_upload, is_binary_upload, ImageUploadError
+from document_pages import read_page_uploads, iter_pages
 from neon_report_db import NeonReportDatabase
 from config import Config
+from gemini_client import gemini_client, GeminiError, GeminiRateLimitError, GeminiCircuitOpenError
+from local_fallback import fallback_chat_reply
+from response_cache import response_cache
+from quiz_pool import QuizPool
+from single_flight import llm_single_flight
+from rate_limiter import rate_limiter, rate_limited, get_client_identity
+from transcript_summarizer import TranscriptSummarizer
+from transcript_store import TranscriptStore, extract_video_id
+from conversation_memory import ConversationMemory
+from job_queue import JobQueue, JobQueueFullError
+from usage_tracker import usage_tracker
+from quiz_parser import (QuizArrayParser, quiz_generation_config, batch_quiz_schema,
+                         is_valid_question, parse_quiz_reply, parse_batch_subjects)
 from pdf_generator import PDFReportGenerator
 from datetime import datetime
 import matplotlib.pyplot as plt
@@ -49,6 +59,26 @@ import numpy as np
 
 # Define this at the top level so all routes can access it
 COURSE_DATA_PATH = os.path.join(os.path.dirname(__file__), 'course_data.json')
+_course_data_cache = {'mtime': None, 'data': []}
+
+def load_course_data():
+    """Load course_data.json, re-reading it only when the file has changed"""
+    try:
+        mtime = os.path.getmtime(COURSE_DATA_PATH)
+    except OSError:
+        return []
+    if _course_data_cache['mtime'] != mtime:
+        with open(COURSE_DATA_PATH, 'r', encoding='utf-8') as f:
+            _course_data_cache['data'] = json.load(f)
+        _course_data_cache['mtime'] = mtime
+    return _course_data_cache['data']
+
+def get_subject_topics(subject):
+    """Return the topic titles for a subject, or an empty list if it doesn't exist"""
+    for item in load_course_data():
+        if item['subject'] == subject:
+            return [topic['title'] for topic in item['topics']]
+    return []
 from datetime import datetime, timedelta
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
@@ -59,40 +89,6 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from io import BytesIO
 import base64
 
-# Configure Tesseract OCR
-try:
-    # Try to find Tesseract in common locations
-    tesseract_paths = [
-        r'C:\Program Files\Tesseract-OCR\tesseract.exe',
-        r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
-        'tesseract'  # If it's in PATH
-    ]
-    
-    tesseract_found = False
-    for path in tesseract_paths:
-        if os.path.exists(path) or path == 'tesseract':
-            try:
-                pytesseract.pytesseract.tesseract_cmd = path
-                # Test if it works
-                pytesseract.get_tesseract_version()
-                print(f"✅ Tesseract found at: {path}")
-                tesseract_found = True
-                break
-            except Exception as e:
-                print(f"⚠️ Tesseract at {path} failed: {e}")
-                continue
-    
-    if not tesseract_found:
-        print("❌ Tesseract OCR not found. OCR features will be disabled.")
-        print("To install Tesseract:")
-        print("1. Download from: https://github.com/UB-Mannheim/tesseract/wiki")
-        print("2. Install to: C:\\Program Files\\Tesseract-OCR\\")
-        print("3. Add to PATH during installation")
-        
-except Exception as e:
-    print(f"❌ Error configuring Tesseract: {e}")
-    print("OCR features will be disabled.")
-
 # Print configuration at startup
 Config.print_config()
 
@@ -194,27 +190,20 @@ educational_content = []
 quizzes = []
 gamification = {"badges": [], "points": 0}
 
-# Rate limiting for API calls
-api_call_times = []
-RATE_LIMIT_WINDOW = 60  # 60 seconds
-MAX_CALLS_PER_WINDOW = 10  # Max 10 calls per minute
+# Upstream Gemini budget, shared by every worker on this host
+RATE_LIMIT_WINDOW = Config.UPSTREAM_RATE_LIMIT_WINDOW
+MAX_CALLS_PER_WINDOW = Config.UPSTREAM_RATE_LIMIT_CALLS
 
 def check_rate_limit():
-    """Check if we're within rate limits"""
-    import time
-    current_time = time.time()
-    
-    # Remove old calls outside the window
-    global api_call_times
-    api_call_times = [call_time for call_time in api_call_times if current_time - call_time < RATE_LIMIT_WINDOW]
-    
-    # Check if we're under the limit
-    if len(api_call_times) >= MAX_CALLS_PER_WINDOW:
-        return False
-    
-    # Record this call
-    api_call_times.append(current_time)
-    return True
+    """Spend one call from the shared upstream budget; False if it is exhausted"""
+    allowed, _ = rate_limiter.consume('upstream:gemini', MAX_CALLS_PER_WINDOW, MAX_CALLS_PER_WINDOW / RATE_LIMIT_WINDOW)
+    return allowed
+
+def upstream_budget_low():
+    """True when the shared upstream budget is down to the share kept for interactive requests"""
+    left = rate_limiter.available('upstream:gemini', MAX_CALLS_PER_WINDOW, MAX_CALLS_PER_WINDOW / RATE_LIMIT_WINDOW)
+    reserve = min(Config.QUIZ_POOL_UPSTREAM_RESERVE, MAX_CALLS_PER_WINDOW - 1)
+    return left < reserve + 1
 
 # 🤖 Load QA Model
 try:
@@ -352,20 +341,69 @@ def test_cors():
         "headers": dict(request.headers)
     })
 
-@app.route("/chat", methods=["POST"])
-def chat():
-    data = request.get_json()
-    user_input = data.get("message", "")
-    action = data.get("action", "default")
-    
-    # Check rate limit first
-    if not check_rate_limit():
-        return jsonify({"reply": "Rate limit exceeded. Please try again later."})
+def generate_background_text(prompt, reserved=False):
+    """Call Gemini for an internal prompt (transcript sections, conversation summaries).
+
+    reserved: the caller already took this call from the upstream budget.
+    """
+    if not reserved and not check_rate_limit():
+        raise GeminiRateLimitError("Rate limit exceeded. Please try again later.")
+    reply = gemini_client.extract_text(gemini_client.generate_text(prompt, task='summarize'))
+    if reply is None:
+        raise GeminiError("Gemini returned no text.")
+    return reply
+
+def reserve_upstream_calls(count):
+    """Take count calls from the shared upstream budget at once, or none of them"""
+    allowed, retry_after = rate_limiter.consume('upstream:gemini', MAX_CALLS_PER_WINDOW,
+                                                MAX_CALLS_PER_WINDOW / RATE_LIMIT_WINDOW, cost=count)
+    if not allowed:
+        raise GeminiRateLimitError(f"Rate limit exceeded. Please try again in {retry_after} seconds.")
+
+# Map calls are reserved up front; keep them to half the upstream budget so the
+# reduce call and other users still fit in the same window
+transcript_summarizer = TranscriptSummarizer(
+    partial(generate_background_text, reserved=True),
+    max_chunks=max(2, min(Config.TRANSCRIPT_MAX_CHUNKS, MAX_CALLS_PER_WINDOW // 2)),
+    reserve=reserve_upstream_calls,
+    cache_scope=gemini_client.router.cache_scope('summarize'))
+transcript_store = TranscriptStore()
+conversation_memory = ConversationMemory(generate_background_text)
+
+# Actions whose prompts carry the conversation so far; summaries and images still get remembered
+CONVERSATIONAL_ACTIONS = {"default", "code", "diagram", "quiz"}
+
+def conversation_identity():
+    """Signed-in users get a conversation session; anonymous callers stay stateless"""
+    identity = get_client_identity()
+    return identity if identity.startswith('user:') else None
+
+def with_conversation(identity, action, prompt):
+    """Prefix a chat prompt with the caller's conversation history"""
+    if identity and action in CONVERSATIONAL_ACTIONS:
+        return conversation_memory.build_prompt(identity, prompt)
+    return prompt
+
+def remember_turn(identity, action, user_input, prompt, reply):
+    """Record a chat exchange in the caller's conversation session"""
+    if not identity:
+        return
+    if action == "summarize":
+        message = f"Summarize this video: {user_input}"
+    elif action == "image":
+        message = prompt
+    else:
+        message = user_input
+    conversation_memory.record(identity, message, reply)
 
-    def extract_video_id(url):
-        match = re.search(r"(?:v=|\/)([0-9A-Za-z_-]{11}).*", url)
-        return match.group(1) if match else None
+def build_chat_prompt(action, user_input, image_bytes=None):
+    """Build the Gemini prompt for a /chat action.
 
+    For the image action the picture comes from image_bytes when it was
+    uploaded as a file, otherwise from a base64 data URL in user_input.
+    Returns (prompt, None) on success or (None, reply) when the request
+    can be answered without calling Gemini.
+    """
     if action == "code":
         prompt = f"Explain this with code: {user_input}"
 
@@ -378,131 +416,206 @@ def chat():
     elif action == "summarize":
         video_id = extract_video_id(user_input)
         if not video_id:
-            return jsonify({"reply": "Invalid YouTube URL."})
+            return None, "Invalid YouTube URL."
         try:
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-            full_transcript = " ".join([entry["text"] for entry in transcript_list][:50])
-            prompt = f"Summarize the key learning points of this video:\n\n{full_transcript}"
+            transcript_list = transcript_store.get_transcript(video_id)
         except Exception as e:
-            return jsonify({"reply": f"Error fetching transcript: {str(e)}"})
+            return None, f"Error fetching transcript: {str(e)}"
+        try:
+            prompt = transcript_summarizer.build_prompt(transcript_list)
+        except GeminiCircuitOpenError:
+            return None, fallback_chat_reply(user_input)["reply"]
+        except Exception as e:
+            return None, f"Error summarizing transcript: {str(e)}"
 
     elif action == "image":
         try:
-            image_data = base64.b64decode(user_input.split(",")[-1])
-            image = Image.open(io.BytesIO(image_data))
-            extracted_text = pytesseract.image_to_string(image)
+            if image_bytes is None:
+                image_bytes = base64.b64decode(user_input.split(",")[-1])
+            extracted_text = ocr_service.image_to_text(image_bytes)
             if not extracted_text.strip():
-                return jsonify({"reply": "Could not extract any readable text from the image."})
+                return None, "Could not extract any readable text from the image."
             prompt = f"This question was extracted from an image. Help solve or explain it:\n\n{extracted_text}"
+        except OCRBusyError:
+            raise
         except Exception as e:
-            return jsonify({"reply": f"Error processing image: {str(e)}"})
+            return None, f"Error processing image: {str(e)}"
 
     else:
         prompt = user_input
 
-    headers = {
-        "Content-Type": "application/json"
-    }
+    return prompt, None
 
-    body = {
-        "contents": [
-            {
-                "parts": [{"text": prompt}]
-            }
-        ]
-    }
+@app.route("/chat", methods=["POST"])
+@rate_limited('chat')
+def chat():
+    # Clients that ask for an event stream get the token-by-token variant
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        return stream_chat_reply()
+
+    action, user_input, image_bytes = read_chat_request()
+    return jsonify(answer_chat(action, user_input, conversation_identity(), image_bytes))
+
+def read_chat_request():
+    """Return (action, message, image bytes) from a JSON body or a multipart / raw image upload"""
+    if is_binary_upload():
+        image_bytes, fields = read_image_upload()
+        return fields.get("action", "image"), fields.get("message", ""), image_bytes
+    data = request.get_json()
+    return data.get("action", "default"), data.get("message", ""), None
+
+def answer_chat(action, user_input, identity=None, image_bytes=None):
+    """Produce the /chat payload for a message; also run as a background job for summaries"""
+    prompt, error_reply = build_chat_prompt(action, user_input, image_bytes)
+    if error_reply is not None:
+        return {"reply": error_reply}
+    base_prompt = prompt
+    prompt = with_conversation(identity, action, prompt)
+
+    # Serve repeated prompts from the response cache before spending an upstream call
+    cache_key = response_cache.make_key(prompt, gemini_client.router.cache_scope(action))
+    cached_reply = response_cache.get(cache_key)
+    if cached_reply is not None:
+        remember_turn(identity, action, user_input, base_prompt, cached_reply)
+        return {"reply": cached_reply, "cached": True}
+
+    # Identical prompts already in flight share one upstream call and one rate-limit slot
+    try:
+        reply = llm_single_flight.do(cache_key, lambda: fetch_chat_reply(prompt, cache_key, action))
+    except GeminiCircuitOpenError:
+        return fallback_chat_reply(prompt, response_cache.get_stale(cache_key))
+    except GeminiError as e:
+        return {"reply": str(e)}
+    except Exception as e:
+        return {"reply": f"Exception occurred: {str(e)}"}
 
-    # Add retry logic and better error handling with rate limiting
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            # Add delay between retries to handle rate limiting
-            if attempt > 0:
-                import time
-                time.sleep(2 ** attempt)  # Exponential backoff: 2s, 4s, 8s
-            
-            response = requests.post(
-                GEMINI_URL, 
-                headers=headers, 
-                data=json.dumps(body),
-                timeout=30,  # Add timeout
-                verify=True   # Ensure SSL verification
-            )
-            
-            # Handle rate limiting specifically
-            if response.status_code == 429:
-                print(f"Rate limited on attempt {attempt + 1}, waiting...")
-                if attempt == max_retries - 1:
-                    return jsonify({"reply": "API rate limit exceeded. Please try again later."})
-                continue
-            
-            response.raise_for_status()  # Raise exception for bad status codes
-            break
-        except requests.exceptions.SSLError as e:
-            print(f"SSL Error on attempt {attempt + 1}: {str(e)}")
-            if attempt == max_retries - 1:
-                return jsonify({"reply": f"SSL connection error: {str(e)}"})
-            continue
-        except requests.exceptions.RequestException as e:
-            print(f"Request error on attempt {attempt + 1}: {str(e)}")
-            if attempt == max_retries - 1:
-                return jsonify({"reply": f"Network error: {str(e)}"})
-            continue
+    remember_turn(identity, action, user_input, base_prompt, reply)
+    return {"reply": reply}
 
-    try:
-        result = response.json()
+@app.route("/chat/reset", methods=["POST"])
+def reset_chat():
+    """Start a new conversation for the signed-in user"""
+    identity = conversation_identity()
+    if identity:
+        conversation_memory.reset(identity)
+    return jsonify({"success": True})
 
-        if "candidates" in result:
-            reply = result["candidates"][0]["content"]["parts"][0]["text"]
-        else:
-            reply = f"Error: {result.get('error', {}).get('message', 'Unknown error')}"
+def fetch_chat_reply(prompt, cache_key, action=None):
+    """Call Gemini for a /chat prompt and cache a successful reply"""
+    if not check_rate_limit():
+        raise GeminiRateLimitError("Rate limit exceeded. Please try again later.")
+
+    result = gemini_client.generate_text(prompt, task=action)
+    reply = gemini_client.extract_text(result)
+    if reply is None:
+        return f"Error: {gemini_client.error_message(result)}"
+    response_cache.set(cache_key, reply)
+    return reply
+
+def sse_event(payload, event=None):
+    """Format one server-sent event carrying a JSON payload"""
+    message = f"data: {json.dumps(payload)}\n\n"
+    if event:
+        message = f"event: {event}\n" + message
+    return message
+
+@app.route("/chat/stream", methods=["POST"])
+@rate_limited('chat')
+def chat_stream():
+    return stream_chat_reply()
+
+def stream_chat_reply():
+    """Stream a /chat reply as server-sent events while Gemini generates it.
+
+    Emits `data: {"text": ...}` for every chunk, then `event: done` with the
+    full reply, or `event: error` if the request fails.
+    """
+    action, user_input, image_bytes = read_chat_request()
+
+    prompt, error_reply = build_chat_prompt(action, user_input, image_bytes)
+    identity = conversation_identity()
+    base_prompt = prompt
+    if error_reply is None:
+        prompt = with_conversation(identity, action, prompt)
+
+    def generate():
+        if error_reply is not None:
+            yield sse_event({"reply": error_reply}, event="error")
+            return
+
+        cache_key = response_cache.make_key(prompt, gemini_client.router.cache_scope(action))
+        cached_reply = response_cache.get(cache_key)
+        if cached_reply is not None:
+            remember_turn(identity, action, user_input, base_prompt, cached_reply)
+            yield sse_event({"text": cached_reply})
+            yield sse_event({"reply": cached_reply, "cached": True}, event="done")
+            return
 
-        return jsonify({"reply": reply})
+        if not check_rate_limit():
+            yield sse_event({"reply": "Rate limit exceeded. Please try again later."}, event="error")
+            return
 
-    except Exception as e:
-        return jsonify({"reply": f"Exception occurred: {str(e)}"})
+        parts = []
+        try:
+            for text in gemini_client.stream_text(prompt, task=action):
+                parts.append(text)
+                yield sse_event({"text": text})
+        except GeminiCircuitOpenError:
+            fallback = fallback_chat_reply(prompt, response_cache.get_stale(cache_key))
+            yield sse_event({"text": fallback["reply"]})
+            yield sse_event(fallback, event="done")
+            return
+        except GeminiError as e:
+            yield sse_event({"reply": str(e)}, event="error")
+            return
+
+        reply = "".join(parts)
+        response_cache.set(cache_key, reply)
+        remember_turn(identity, action, user_input, base_prompt, reply)
+        yield sse_event({"reply": reply}, event="done")
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 @app.route("/upload-image", methods=["POST"])
+@rate_limited('upload-image')
 def upload_image():
     try:
-        data = request.get_json()
-        image_data = data.get("image", "")
-
-        if not image_data:
+        # Multipart, raw image body or the original JSON data URL
+        image_bytes, _ = read_image_upload()
+        if not image_bytes:
             return jsonify({"reply": "No image received"})
 
-        image_bytes = base64.b64decode(image_data.split(",")[1])
-        image = Image.open(io.BytesIO(image_bytes))
-
         # Try to extract text using OCR
         extracted_text = ""
         try:
-            extracted_text = pytesseract.image_to_string(image)
+            extracted_text = ocr_service.image_to_text(image_bytes)
             if not extracted_text.strip():
                 extracted_text = "No text could be extracted from the image"
-        except Exception as ocr_error:
+        except OCRBusyError:
+            raise
+        except OCRError as ocr_error:
             print(f"OCR Error: {ocr_error}")
             extracted_text = "OCR is not available. Please install Tesseract OCR."
         
         prompt = f"Explain this question step-by-step:\n{extracted_text}"
 
-        headers = {"Content-Type": "application/json"}
-        body = {
-            "contents": [
-                {
-                    "parts": [{"text": prompt}]
-                }
-            ]
-        }
-        response = requests.post(GEMINI_URL, headers=headers, data=json.dumps(body))
-        result = response.json()
-        if "candidates" in result:
-            reply = result["candidates"][0]["content"]["parts"][0]["text"]
-        else:
-            reply = f"Error: {result.get('error', {}).get('message', 'Unknown error')}"
+        try:
+            result = gemini_client.generate_text(prompt)
+        except GeminiCircuitOpenError:
+            return jsonify(fallback_chat_reply(prompt))
+        except GeminiError as e:
+            return jsonify({"reply": str(e)})
+        reply = gemini_client.extract_text(result)
+        if reply is None:
+            reply = f"Error: {gemini_client.error_message(result)}"
 
         return jsonify({"reply": reply})
 
+    except (OCRBusyError, ImageUploadError):
+        raise
     except Exception as e:
         return jsonify({"reply": f"Error: {str(e)}"})
 
@@ -570,33 +683,23 @@ def get_topics_by_subject(subject):
                     return jsonify(item['topics'])
     return jsonify([])
 
-@app.route('/api/generate-quiz/<subject>', methods=['GET'])
-def generate_quiz(subject):
-    """Generate quiz questions for a specific subject using Gemini API"""
-    try:
-        # Check rate limit first
-        if not check_rate_limit():
-            return jsonify({
-                "error": "Rate limit exceeded. Please try again later.",
-                "retry_after": 60
-            }), 429
-        # Get topics for the subject
-        data_path = os.path.join(os.path.dirname(__file__), 'course_data.json')
-        topics = []
-        if os.path.exists(data_path):
-            with open(data_path) as f:
-                content = json.load(f)
-                for item in content:
-                    if item['subject'] == subject:
-                        topics = [topic['title'] for topic in item['topics']]
-                        break
-        
-        if not topics:
-            return jsonify({"error": "No topics found for this subject"}), 404
-        
-        # Create prompt for Gemini
-        topics_text = ", ".join(topics)
-        prompt = f"""Generate 5 multiple choice quiz questions for the subject "{subject}" covering these topics: {topics_text}.
+class QuizParseError(Exception):
+    """Raised when the AI reply does not contain a parsable quiz array"""
+    def __init__(self, message, raw_response):
+        super().__init__(message)
+        self.raw_response = raw_response
+
+QUIZ_QUESTION_RULES = """Make sure:
+- Questions are relevant to the subject and topics
+- All options are plausible but only one is correct
+- correct_answer is the index (0-3) of the correct option
+- Questions test understanding, not just memorization
+- Difficulty level is appropriate for students learning this subject"""
+
+def build_quiz_prompt(subject, topics, count=5):
+    """Build the Gemini prompt for a quiz on a subject"""
+    topics_text = ", ".join(topics)
+    return f"""Generate {count} multiple choice quiz questions for the subject "{subject}" covering these topics: {topics_text}.
 
 Please format the response as a JSON array with this structure:
 [
@@ -608,111 +711,283 @@ Please format the response as a JSON array with this structure:
   }}
 ]
 
-Make sure:
-- Questions are relevant to the subject and topics
-- All options are plausible but only one is correct
-- correct_answer is the index (0-3) of the correct option
-- Questions test understanding, not just memorization
-- Difficulty level is appropriate for students learning this subject"""
+{QUIZ_QUESTION_RULES}"""
+
+def request_quiz_questions(subject, topics, count=5):
+    """Ask Gemini for a fresh quiz. Raises GeminiError or QuizParseError."""
+    result = gemini_client.generate_text(build_quiz_prompt(subject, topics, count), task='quiz',
+                                         generation_config=quiz_generation_config())
+    reply = gemini_client.extract_text(result)
+    if reply is None:
+        raise GeminiError(f"AI API error: {gemini_client.error_message(result)}")
+
+    # Keep every well-formed question even if the array as a whole is truncated or malformed
+    questions, salvaged = parse_quiz_reply(reply)
+    if not questions:
+        raise QuizParseError("Could not parse quiz data from AI response", reply)
+    if salvaged:
+        print(f"⚠️ Salvaged {len(questions)} quiz questions for {subject} from a malformed reply")
+    return questions
+
+def request_quiz_within_budget(subject, topics, count=5):
+    """Spend one slot of the upstream rate limit on a fresh quiz"""
+    if not check_rate_limit():
+        raise GeminiRateLimitError("Rate limit exceeded. Please try again later.")
+    return request_quiz_questions(subject, topics, count)
 
-        headers = {
-            "Content-Type": "application/json"
-        }
+def build_batch_quiz_prompt(batch):
+    """Build one Gemini prompt covering several subjects.
 
-        body = {
-            "contents": [
-                {
-                    "parts": [{"text": prompt}]
-                }
-            ]
-        }
+    batch: list of (subject, topics, count) tuples
+    """
+    subject_lines = "\n".join(
+        f'- "{subject}" ({count} questions) covering these topics: {", ".join(topics)}'
+        for subject, topics, count in batch
+    )
+    return f"""Generate multiple choice quiz questions for each of these subjects:
+{subject_lines}
+
+Please format the response as a single JSON object. Use the exact subject names above as keys, and give each subject a JSON array of questions with this structure:
+{{
+  "Subject name": [
+    {{
+      "question": "Question text here?",
+      "options": ["Option A", "Option B", "Option C", "Option D"],
+      "correct_answer": 0,
+      "explanation": "Brief explanation of the correct answer"
+    }}
+  ]
+}}
+
+{QUIZ_QUESTION_RULES}"""
+
+def is_valid_question_list(questions):
+    """Check that a parsed quiz is a non-empty list of well-formed questions"""
+    return isinstance(questions, list) and bool(questions) and all(is_valid_question(q) for q in questions)
+
+def parse_batch_quiz_reply(reply, subjects):
+    """Pull each subject's question array out of a batch reply.
+
+    Returns a dict of the subjects that parsed; missing or malformed subjects
+    are left out so the caller can retry them individually.
+    """
+    json_match = re.search(r'\{.*\}', reply, re.DOTALL)
+    if not json_match:
+        return {}
+    try:
+        data = json.loads(json_match.group())
+    except json.JSONDecodeError as e:
+        print(f"Batch quiz reply was not valid JSON: {e}")
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    quizzes = {}
+    for subject in subjects:
+        # Drop malformed questions rather than the whole subject
+        questions = data.get(subject)
+        if isinstance(questions, list):
+            questions = [question for question in questions if is_valid_question(question)]
+            if questions:
+                quizzes[subject] = questions
+    return quizzes
+
+quiz_pool = QuizPool(request_quiz_within_budget, get_subject_topics, should_defer=upstream_budget_low)
+if Config.QUIZ_POOL_PREWARM:
+    quiz_pool.warm([item['subject'] for item in load_course_data()])
 
-        # Add retry logic and better error handling with rate limiting
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # Add delay between retries to handle rate limiting
-                if attempt > 0:
-                    import time
-                    time.sleep(2 ** attempt)  # Exponential backoff: 2s, 4s, 8s
-                
-                response = requests.post(
-                    GEMINI_URL, 
-                    headers=headers, 
-                    data=json.dumps(body),
-                    timeout=30,  # Add timeout
-                    verify=True   # Ensure SSL verification
-                )
-                
-                # Handle rate limiting specifically
-                if response.status_code == 429:
-                    print(f"Rate limited on attempt {attempt + 1}, waiting...")
-                    if attempt == max_retries - 1:
-                        return jsonify({
-                            "error": "API rate limit exceeded. Please try again later.",
-                            "retry_after": 60
-                        }), 429
-                    continue
-                
-                response.raise_for_status()  # Raise exception for bad status codes
-                break
-            except requests.exceptions.SSLError as e:
-                print(f"SSL Error on attempt {attempt + 1}: {str(e)}")
-                if attempt == max_retries - 1:
-                    return jsonify({"error": f"SSL connection error: {str(e)}"}), 500
-                continue
-            except requests.exceptions.RequestException as e:
-                print(f"Request error on attempt {attempt + 1}: {str(e)}")
-                if attempt == max_retries - 1:
-                    return jsonify({"error": f"Network error: {str(e)}"}), 500
-                continue
-        
-        result = response.json()
-
-        if "candidates" in result:
-            reply = result["candidates"][0]["content"]["parts"][0]["text"]
-            
-            # Try to extract JSON from the response
-            try:
-                # Find JSON array in the response
-                import re
-                json_match = re.search(r'\[.*\]', reply, re.DOTALL)
-                if json_match:
-                    quiz_data = json.loads(json_match.group())
-                    return jsonify({
-                        "success": True,
-                        "questions": quiz_data,
-                        "subject": subject
-                    })
-                else:
-                    return jsonify({
-                        "error": "Could not parse quiz data from AI response",
-                        "raw_response": reply
-                    }), 500
-            except json.JSONDecodeError as e:
-                return jsonify({
-                    "error": f"Failed to parse quiz data: {str(e)}",
-                    "raw_response": reply
-                }), 500
-        else:
-            return jsonify({
-                "error": f"AI API error: {result.get('error', {}).get('message', 'Unknown error')}"
-            }), 500
+@app.route('/api/generate-quiz/<subject>', methods=['GET'])
+@rate_limited('generate-quiz')
+def generate_quiz(subject):
+    """Generate quiz questions for a specific subject using Gemini API"""
+    payload, status = build_quiz_response(subject)
+    return jsonify(payload), status
+
+def build_quiz_response(subject):
+    """Return (payload, status) for a quiz request; also run as a background job"""
+    topics = []
+    try:
+        # Get topics for the subject
+        topics = get_subject_topics(subject)
+        if not topics:
+            return {"error": "No topics found for this subject"}, 404
+
+        # Serve a pre-generated quiz when the pool has one ready
+        pooled_questions = quiz_pool.get(subject, topics)
+        if pooled_questions is not None:
+            return {
+                "success": True,
+                "questions": pooled_questions,
+                "subject": subject
+            }, 200
+
+        # A classroom asking for the same subject at once shares one upstream call
+        flight_key = f"quiz:{subject}:{QuizPool.topics_key(topics)}"
+        try:
+            quiz_data = llm_single_flight.do(flight_key, lambda: request_quiz_within_budget(subject, topics))
+        except GeminiCircuitOpenError:
+            # Gemini is degraded: answer immediately from the local question bank
+            return {
+                "success": True,
+                "questions": generate_sample_questions(subject, topics),
+                "subject": subject,
+                "note": "Using sample questions while the AI service is unavailable"
+            }, 200
+        except GeminiRateLimitError as e:
+            return {
+                "error": str(e),
+                "retry_after": 60
+            }, 429
+        except GeminiError as e:
+            return {"error": str(e)}, 500
+        except QuizParseError as e:
+            return {
+                "error": str(e),
+                "raw_response": e.raw_response
+            }, 500
+
+        return {
+            "success": True,
+            "questions": quiz_data,
+            "subject": subject
+        }, 200
 
     except Exception as e:
         print(f"Error generating quiz: {str(e)}")
         # Fallback: Generate sample questions locally
         try:
             sample_questions = generate_sample_questions(subject, topics)
-            return jsonify({
+            return {
                 "success": True,
                 "questions": sample_questions,
                 "subject": subject,
                 "note": "Using sample questions due to API connectivity issues"
-            })
+            }, 200
         except Exception as fallback_error:
             print(f"Fallback also failed: {str(fallback_error)}")
-            return jsonify({"error": f"Failed to generate quiz: {str(e)}"}), 500
+            return {"error": f"Failed to generate quiz: {str(e)}"}, 500
+
+@app.route('/api/generate-quiz/<subject>/stream', methods=['GET'])
+@rate_limited('generate-quiz')
+def stream_quiz(subject):
+    """Stream a quiz as server-sent events, one `question` event per question as it is generated.
+
+    Ends with `event: done` carrying the full question list, or `event: error`.
+    """
+    topics = get_subject_topics(subject)
+    if not topics:
+        return jsonify({"error": "No topics found for this subject"}), 404
+
+    def emit_all(questions, note=None):
+        for question in questions:
+            yield sse_event({"question": question}, event="question")
+        payload = {"success": True, "questions": questions, "subject": subject}
+        if note:
+            payload["note"] = note
+        yield sse_event(payload, event="done")
+
+    def generate():
+        pooled_questions = quiz_pool.get(subject, topics)
+        if pooled_questions is not None:
+            yield from emit_all(pooled_questions)
+            return
+
+        if not check_rate_limit():
+            yield sse_event({"error": "Rate limit exceeded. Please try again later.", "retry_after": 60}, event="error")
+            return
+
+        parser = QuizArrayParser()
+        try:
+            for text in gemini_client.stream_text(build_quiz_prompt(subject, topics), task='quiz',
+                                                  generation_config=quiz_generation_config()):
+                for question in parser.feed(text):
+                    yield sse_event({"question": question}, event="question")
+        except GeminiCircuitOpenError:
+            yield from emit_all(generate_sample_questions(subject, topics),
+                                note="Using sample questions while the AI service is unavailable")
+            return
+        except GeminiError as e:
+            if not parser.questions:
+                yield sse_event({"error": str(e)}, event="error")
+                return
+
+        if not parser.questions:
+            yield sse_event({"error": "Could not parse quiz data from AI response"}, event="error")
+            return
+        yield sse_event({"success": True, "questions": parser.questions, "subject": subject,
+                         "skipped": parser.skipped}, event="done")
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/generate-quiz/batch', methods=['POST'])
+@rate_limited('generate-quiz')
+def generate_quiz_batch():
+    """Generate quizzes for several subjects with one upstream Gemini call.
+
+    Body: {"subjects": ["Data Structures", {"subject": "Machine Learning", "count": 3}]}
+    Subjects missing from the batch reply are retried with one call each.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object with a subjects list"}), 400
+    try:
+        requested = parse_batch_subjects(data.get('subjects'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if len(requested) > Config.QUIZ_BATCH_MAX_SUBJECTS:
+        return jsonify({"error": f"At most {Config.QUIZ_BATCH_MAX_SUBJECTS} subjects per batch"}), 400
+
+    batch = []
+    errors = {}
+    for subject, count in requested:
+        topics = get_subject_topics(subject)
+        if not topics:
+            errors[subject] = "No topics found for this subject"
+            continue
+        batch.append((subject, topics, count))
+
+    quizzes = {}
+    upstream_calls = 0
+    if batch:
+        try:
+            if not check_rate_limit():
+                raise GeminiRateLimitError("Rate limit exceeded. Please try again later.")
+            upstream_calls += 1
+            schema = batch_quiz_schema([subject for subject, _, _ in batch])
+            result = gemini_client.generate_text(build_batch_quiz_prompt(batch), task='quiz',
+                                                 generation_config=quiz_generation_config(schema))
+            reply = gemini_client.extract_text(result)
+            if reply is not None:
+                quizzes = parse_batch_quiz_reply(reply, [subject for subject, _, _ in batch])
+        except GeminiCircuitOpenError:
+            for subject, topics, count in batch:
+                quizzes[subject] = generate_sample_questions(subject, topics)[:count]
+        except GeminiRateLimitError as e:
+            return jsonify({
+                "error": str(e),
+                "retry_after": 60
+            }), 429
+        except GeminiError as e:
+            print(f"Batch quiz generation failed, retrying per subject: {e}")
+
+    # Fall back to one call per subject only for the subjects the batch didn't cover
+    for subject, topics, count in batch:
+        if subject in quizzes:
+            continue
+        try:
+            upstream_calls += 1
+            quizzes[subject] = request_quiz_within_budget(subject, topics, count)
+        except (GeminiError, QuizParseError) as e:
+            errors[subject] = str(e)
+
+    return jsonify({
+        "success": bool(quizzes),
+        "quizzes": quizzes,
+        "errors": errors,
+        "upstream_calls": upstream_calls
+    })
 
 def generate_sample_questions(subject, topics):
     """Generate sample quiz questions locally as fallback"""
@@ -1513,6 +1788,9 @@ def add_topic():
             return jsonify({'error': 'Subject not found'}), 404
         with open(COURSE_DATA_PATH, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2)
+        quiz_pool.invalidate(subject)
+        # Fetch the new video's transcript now so its first summary doesn't wait on YouTube
+        threading.Thread(target=transcript_store.warm, args=([videoUrl],), daemon=True).start()
         return jsonify({'success': True, 'data': data})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1535,6 +1813,7 @@ def delete_topic():
             return jsonify({'error': 'Subject not found'}), 404
         with open(COURSE_DATA_PATH, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2)
+        quiz_pool.invalidate(subject)
         return jsonify({'success': True, 'data': data})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1589,49 +1868,124 @@ This analysis is based on general programming best practices. For more detailed
 
 @app.route('/check-ocr', methods=['GET'])
 def check_ocr():
-    """Check if OCR (Tesseract) is properly installed and working"""
-    try:
-        if PYTESSERACT_AVAILABLE:
-            import pytesseract
-            version = pytesseract.get_tesseract_version()
-            return jsonify({
-                'status': 'success',
-                'message': 'OCR is available',
-                'tesseract_version': str(version),
-                'available': True
-            })
-        else:
-            return jsonify({
-                'status': 'error',
-                'message': 'pytesseract library not installed',
-                'available': False
-            })
-    except Exception as e:
+    """Check if OCR (Tesseract) is properly installed and working, from the once-per-process probe"""
+    capabilities = ocr_capabilities.get()
+    if capabilities['available']:
         return jsonify({
-            'status': 'error',
-            'message': f'Tesseract not properly configured: {str(e)}',
-            'available': False
+            'status': 'success',
+            'message': 'OCR is available',
+            'tesseract_version': capabilities['tesseract_version'],
+            'tesseract_cmd': capabilities['tesseract_cmd'],
+            'engine': capabilities['engine'],
+            'available': True
         })
+    return jsonify({
+        'status': 'error',
+        'message': capabilities['error'],
+        'available': False
+    })
+
+# Slow LLM work (quiz generation, video summaries) as background jobs polled by the client
+job_queue = JobQueue()
+
+def queue_job(kind, fn):
+    """Submit a job and answer 202 with its id, or 503 when the queue is full"""
+    labels = usage_tracker.current_labels()
+
+    def run():
+        with usage_tracker.labels(**labels):
+            return fn()
+
+    try:
+        job_id = job_queue.submit(kind, run, owner=labels['user'])
+    except JobQueueFullError as e:
+        response = jsonify({"error": str(e), "retry_after": 5})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    return jsonify({
+        "job_id": job_id,
+        "status": JobQueue.QUEUED,
+        "poll_url": f"/api/jobs/{job_id}"
+    }), 202
+
+@app.route('/api/jobs/generate-quiz/<subject>', methods=['POST'])
+@rate_limited('generate-quiz')
+def submit_quiz_job(subject):
+    """Start generating a quiz in the background"""
+    def run():
+        payload, status = build_quiz_response(subject)
+        return {"status_code": status, "response": payload}
+    return queue_job('generate-quiz', run)
+
+@app.route('/api/jobs/summarize', methods=['POST'])
+@rate_limited('chat')
+def submit_summarize_job():
+    """Start summarizing a YouTube video in the background. Body: {"url": "..."}"""
+    data = request.get_json() or {}
+    url = data.get('url') or data.get('message', '')
+    if not extract_video_id(url):
+        return jsonify({"error": "Invalid YouTube URL."}), 400
+    identity = conversation_identity()
+    return queue_job('summarize', lambda: {"status_code": 200, "response": answer_chat("summarize", url, identity)})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Return a job's status and result; ?wait=N long-polls up to N seconds for it to finish"""
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        wait = 0
+    job = job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id)
+    if job is None or job.pop('owner') not in (None, get_client_identity()):
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Report counters for the LLM and OCR performance layers"""
+    return jsonify({
+        'response_cache': response_cache.stats(),
+        'quiz_pool': quiz_pool.stats(),
+        'single_flight': llm_single_flight.stats(),
+        'transcript_summarizer': transcript_summarizer.stats(),
+        'transcript_store': transcript_store.stats(),
+        'conversation_memory': conversation_memory.stats(),
+        'jobs': job_queue.stats(),
+        'upstream': gemini_client.executor.stats(),
+        'rate_limiter': rate_limiter.stats(),
+        'circuit_breaker': gemini_client.breaker.stats(),
+        'gemini_router': gemini_client.router.stats(),
+        'usage': usage_tracker.stats(top_users=0)['totals'],
+        'ocr': ocr_service.stats()
+    })
+
+@app.route('/api/metrics/usage', methods=['GET'])
+@jwt_required()
+def get_usage_metrics():
+    """Token, latency and retry totals per route:action, endpoint and user (?top=N users; teachers only)"""
+    # Per-user rows are keyed by username and client IP
+    if get_jwt().get('role') not in ('teacher', 'admin'):
+        return jsonify({'error': 'Only teachers can view usage metrics'}), 403
+    try:
+        top = int(request.args.get('top', 20))
+    except ValueError:
+        top = 20
+    return jsonify(usage_tracker.stats(top_users=top))
 
 @app.route('/analyze-image', methods=['POST'])
 def analyze_image():
     """Analyze uploaded images for educational content"""
     try:
-        data = request.get_json()
-        image_data = data.get('image')
+        # Multipart, raw image body (analysis_type in the query string) or the original JSON data URL
+        image_bytes, data = read_image_upload()
         analysis_type = data.get('analysis_type', 'educational')
         
-        if not image_data:
+        if not image_bytes:
             return jsonify({'error': 'Image data is required'}), 400
         
-        # Remove data URL prefix if present
-        if image_data.startswith('data:image'):
-            image_data = image_data.split(',')[1]
-        
-        # Decode base64 image
+        # Check the header parses as an image before queueing OCR
         try:
-            image_bytes = base64.b64decode(image_data)
-            image = Image.open(io.BytesIO(image_bytes))
+            Image.open(io.BytesIO(image_bytes))
         except Exception as decode_error:
             print(f"Error decoding image: {decode_error}")
             return jsonify({'error': 'Invalid image format'}), 400
@@ -1642,14 +1996,15 @@ def analyze_image():
         try:
             # Check if pytesseract is available
             if PYTESSERACT_AVAILABLE:
-                import pytesseract
-                text = pytesseract.image_to_string(image)
+                text = ocr_service.image_to_text(image_bytes, profile=analysis_type)
                 text = text.strip()
                 ocr_success = True
                 print(f"OCR extracted text: {text[:100]}...")  # Log first 100 chars
             else:
                 print("pytesseract not installed")
                 text = "OCR library not available"
+        except OCRBusyError:
+            raise
         except Exception as ocr_error:
             print(f"OCR Error: {ocr_error}")
             text = "Could not extract text from image"
@@ -1804,10 +2159,111 @@ Would you like me to explain any specific part of this code or help you understa
         
         return jsonify({'analysis': analysis})
         
+    except (OCRBusyError, ImageUploadError):
+        raise
     except Exception as e:
         print(f"Error analyzing image: {e}")
         return jsonify({'error': f'Failed to analyze image: {str(e)}'}), 500
 
+def build_pages_prompt(page_texts):
+    """One prompt covering every page of a problem set, trimmed to OCR_BATCH_PROMPT_CHARS"""
+    budget = Config.OCR_BATCH_PROMPT_CHARS // max(1, len(page_texts))
+    sections = []
+    for number, text in enumerate(page_texts, start=1):
+        text = (text or "").strip() or "[no readable text]"
+        if len(text) > budget:
+            text = text[:budget] + " ..."
+        sections.append(f"--- Page {number} ---\n{text}")
+    return ("These pages were photographed from a student's problem set and read with OCR. "
+            "Give one combined analysis: list the questions across all pages, then explain "
+            "how to solve each one step-by-step.\n\n" + "\n\n".join(sections))
+
+def analyze_page_texts(page_texts):
+    """Combined Gemini analysis of the recognised pages, served from the response cache when repeated"""
+    if not any((text or "").strip() for text in page_texts):
+        return "No text could be extracted from these pages."
+    prompt = build_pages_prompt(page_texts)
+    cache_key = response_cache.make_key(prompt, gemini_client.router.cache_scope('summarize'))
+    cached_reply = response_cache.get(cache_key)
+    if cached_reply is not None:
+        return cached_reply
+    try:
+        return llm_single_flight.do(cache_key, lambda: fetch_chat_reply(prompt, cache_key, 'summarize'))
+    except GeminiCircuitOpenError:
+        return fallback_chat_reply(prompt, response_cache.get_stale(cache_key))["reply"]
+    except GeminiError as e:
+        return str(e)
+
+@app.route('/analyze-pages', methods=['POST'])
+@rate_limited('analyze-pages')
+def analyze_pages():
+    """OCR a multi-page problem set (several images and/or a PDF) and analyse it as a whole.
+
+    Pages are recognised in parallel on the OCR pool. Returns per-page text
+    plus one combined analysis; clients that accept text/event-stream get
+    the streaming variant.
+    """
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        return stream_page_analysis()
+    blobs, page_count, data = read_page_uploads()
+    if not page_count:
+        return jsonify({'error': 'At least one image or PDF is required'}), 400
+    if not PYTESSERACT_AVAILABLE:
+        return jsonify({'error': 'OCR library not available'}), 503
+
+    results = [None] * page_count
+    for index, text, error in ocr_service.iter_images_to_text(iter_pages(blobs), profile=data.get('analysis_type', 'educational')):
+        results[index] = {'page': index + 1, 'text': (text or '').strip(), 'error': str(error) if error else None}
+
+    return jsonify({
+        'pages': results,
+        'page_count': page_count,
+        'analysis': analyze_page_texts([page['text'] for page in results])
+    })
+
+@app.route('/analyze-pages/stream', methods=['POST'])
+@rate_limited('analyze-pages')
+def analyze_pages_stream():
+    return stream_page_analysis()
+
+def stream_page_analysis():
+    """Stream /analyze-pages as server-sent events.
+
+    Emits `event: start` with the page count, `event: page` for each page as
+    soon as it is recognised (in completion order, so page 1 can render while
+    page 10 is still being read), then `event: done` with every page and the
+    combined analysis, or `event: error`.
+    """
+    blobs, page_count, data = read_page_uploads()
+    profile = data.get('analysis_type', 'educational')
+
+    def generate():
+        if not page_count:
+            yield sse_event({'error': 'At least one image or PDF is required'}, event='error')
+            return
+        if not PYTESSERACT_AVAILABLE:
+            yield sse_event({'error': 'OCR library not available'}, event='error')
+            return
+
+        yield sse_event({'page_count': page_count}, event='start')
+        results = [None] * page_count
+        try:
+            # PDF pages are rendered here, each one as a worker frees up, not before the stream starts
+            for index, text, error in ocr_service.iter_images_to_text(iter_pages(blobs), profile=profile):
+                results[index] = {'page': index + 1, 'text': (text or '').strip(), 'error': str(error) if error else None}
+                yield sse_event(results[index], event='page')
+        except ImageUploadError as e:
+            yield sse_event({'error': str(e)}, event='error')
+            return
+
+        analysis = analyze_page_texts([page['text'] for page in results])
+        yield sse_event({'pages': results, 'page_count': page_count, 'analysis': analysis}, event='done')
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/voice-to-text', methods=['POST'])
 def voice_to_text():
     """Convert voice input to text using speech recognition"""
@@ -1883,6 +2339,17 @@ def create_collaboration_session():
         print(f"Error creating collaboration session: {e}")
         return jsonify({'error': 'Failed to create collaboration session'}), 500
 
+@app.errorhandler(OCRBusyError)
+def handle_ocr_busy(e):
+    """The OCR queue is full: ask the client to come back instead of queueing more work"""
+    response = jsonify({"error": str(e), "reply": str(e), "retry_after": e.retry_after})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+@app.errorhandler(ImageUploadError)
+def handle_image_upload_error(e):
+    return jsonify({"error": str(e), "reply": str(e)}), e.status
+
 @app.errorhandler(Exception)
 def handle_exception(e):
     code = getattr(e, 'code', 500)
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import deque
+from config import Config
+
+
+class CircuitBreaker:
+    """Closed / open / half-open circuit breaker over a rolling outcome window.
+
+    The circuit opens when, over the last `window` seconds, either the error
+    rate or the share of slow calls crosses its threshold. While open every
+    call is refused immediately so routes can fall back locally. After
+    `cooldown` seconds a few half-open probe calls are let through; a
+    successful probe closes the circuit, a failed one re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window: float = None, min_calls: int = None, error_threshold: float = None,
+                 slow_call_seconds: float = None, slow_call_threshold: float = None,
+                 cooldown: float = None, half_open_probes: int = None):
+        self.window = window or Config.CIRCUIT_WINDOW
+        self.min_calls = min_calls or Config.CIRCUIT_MIN_CALLS
+        self.error_threshold = error_threshold or Config.CIRCUIT_ERROR_THRESHOLD
+        self.slow_call_seconds = slow_call_seconds or Config.CIRCUIT_SLOW_CALL_SECONDS
+        self.slow_call_threshold = slow_call_threshold or Config.CIRCUIT_SLOW_CALL_THRESHOLD
+        self.cooldown = cooldown or Config.CIRCUIT_COOLDOWN
+        self.half_open_probes = half_open_probes or Config.CIRCUIT_HALF_OPEN_PROBES
+
+        self.state = self.CLOSED
+        self._outcomes = deque()
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.short_circuited = 0
+
+    def allow_request(self) -> bool:
+        """Return True if a call may go upstream now"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    self.short_circuited += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._probes_in_flight = 0
+            if self.state == self.HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    self.short_circuited += 1
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def record_success(self, latency: float):
+        self._record(True, latency)
+
+    def record_failure(self, latency: float):
+        self._record(False, latency)
+
+    def _record(self, ok, latency):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if ok and latency < self.slow_call_seconds:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open(now)
+                return
+
+            self._outcomes.append((now, ok, latency))
+            while self._outcomes and now - self._outcomes[0][0] > self.window:
+                self._outcomes.popleft()
+
+            if self.state == self.CLOSED and len(self._outcomes) >= self.min_calls:
+                total = len(self._outcomes)
+                errors = sum(1 for _, success, _ in self._outcomes if not success)
+                slow = sum(1 for _, _, seconds in self._outcomes if seconds >= self.slow_call_seconds)
+                if errors / total >= self.error_threshold or slow / total >= self.slow_call_threshold:
+                    self._open(now)
+
+    def _open(self, now):
+        """Trip the circuit (lock held)"""
+        self.state = self.OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        self.times_opened += 1
+        print(f"⚠️ Gemini circuit opened for {self.cooldown}s")
+
+    def stats(self) -> dict:
+        """Return circuit state and rolling error/latency figures for the metrics endpoint"""
+        with self._lock:
+            total = len(self._outcomes)
+            errors = sum(1 for _, success, _ in self._outcomes if not success)
+            latencies = sorted(seconds for _, _, seconds in self._outcomes)
+            return {
+                'state': self.state,
+                'window_calls': total,
+                'window_error_rate': round(errors / total, 4) if total else 0.0,
+                'window_p50_latency': round(latencies[total // 2], 3) if total else None,
+                'times_opened': self.times_opened,
+                'short_circuited': self.short_circuited
+            }
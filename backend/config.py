@@ -1,4 +1,5 @@
 import os
+import tempfile
 from typing import Optional
 
 class Config:
@@ -13,11 +14,119 @@ class Config:
     JWT_ACCESS_TOKEN_EXPIRES = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 86400))  # 24 hours in seconds
     
     # API Configuration   
+    # GEMINI_API_BASE can point at mock_gemini_server.py for offline benchmarks
+    GEMINI_API_BASE = os.getenv('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta').rstrip('/')
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
     if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY environment variable is required")
-    GEMINI_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
-    
+        if GEMINI_API_BASE.startswith('https://generativelanguage.googleapis.com'):
+            raise ValueError("GEMINI_API_KEY environment variable is required")
+        GEMINI_API_KEY = 'local-mock'
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+    GEMINI_URL = f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+    GEMINI_STREAM_URL = f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
+
+    # Gemini router: extra keys and models, comma separated (quiz/summarize use fast models, code heavy ones)
+    GEMINI_API_KEYS = [key.strip() for key in os.getenv('GEMINI_API_KEYS', '').split(',') if key.strip()] or [GEMINI_API_KEY]
+    GEMINI_FAST_MODELS = [model.strip() for model in os.getenv('GEMINI_FAST_MODELS', '').split(',') if model.strip()] or [GEMINI_MODEL]
+    GEMINI_HEAVY_MODELS = [model.strip() for model in os.getenv('GEMINI_HEAVY_MODELS', '').split(',') if model.strip()]
+    GEMINI_ROUTER_EWMA_ALPHA = float(os.getenv('GEMINI_ROUTER_EWMA_ALPHA', 0.3))
+    GEMINI_ROUTER_COOLDOWN = float(os.getenv('GEMINI_ROUTER_COOLDOWN', 10))
+
+    # Gemini HTTP client (connection pool, timeouts and retry policy)
+    GEMINI_POOL_CONNECTIONS = int(os.getenv('GEMINI_POOL_CONNECTIONS', 4))
+    GEMINI_POOL_MAXSIZE = int(os.getenv('GEMINI_POOL_MAXSIZE', 20))
+    GEMINI_CONNECT_TIMEOUT = float(os.getenv('GEMINI_CONNECT_TIMEOUT', 5))
+    GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', 30))
+    GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', 3))
+    GEMINI_BACKOFF_BASE = float(os.getenv('GEMINI_BACKOFF_BASE', 2))
+    GEMINI_MAX_BACKOFF = float(os.getenv('GEMINI_MAX_BACKOFF', 8))
+
+    # Upstream execution layer (worker pool, request deadline and global retry budget)
+    UPSTREAM_WORKERS = int(os.getenv('UPSTREAM_WORKERS', 16))
+    UPSTREAM_DEADLINE = float(os.getenv('UPSTREAM_DEADLINE', 45))
+    RETRY_BUDGET_RATIO = float(os.getenv('RETRY_BUDGET_RATIO', 0.2))
+    RETRY_BUDGET_MAX = float(os.getenv('RETRY_BUDGET_MAX', 10))
+
+    # Gemini circuit breaker
+    CIRCUIT_WINDOW = float(os.getenv('CIRCUIT_WINDOW', 60))
+    CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', 5))
+    CIRCUIT_ERROR_THRESHOLD = float(os.getenv('CIRCUIT_ERROR_THRESHOLD', 0.5))
+    CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv('CIRCUIT_SLOW_CALL_SECONDS', 15))
+    CIRCUIT_SLOW_CALL_THRESHOLD = float(os.getenv('CIRCUIT_SLOW_CALL_THRESHOLD', 0.8))
+    CIRCUIT_COOLDOWN = float(os.getenv('CIRCUIT_COOLDOWN', 30))
+    CIRCUIT_HALF_OPEN_PROBES = int(os.getenv('CIRCUIT_HALF_OPEN_PROBES', 1))
+
+    # Rate limiting (token buckets shared by all workers through a SQLite file)
+    RATE_LIMIT_DB = os.getenv('RATE_LIMIT_DB', os.path.join(tempfile.gettempdir(), 'ai_tutor_rate_limits.db'))
+    # Reverse proxies in front of the app (1 on Render); 0 ignores X-Forwarded-For
+    TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+    USER_RATE_LIMIT_CAPACITY = int(os.getenv('USER_RATE_LIMIT_CAPACITY', 10))
+    USER_RATE_LIMIT_WINDOW = float(os.getenv('USER_RATE_LIMIT_WINDOW', 60))
+    UPSTREAM_RATE_LIMIT_CALLS = int(os.getenv('UPSTREAM_RATE_LIMIT_CALLS', 10))
+    UPSTREAM_RATE_LIMIT_WINDOW = float(os.getenv('UPSTREAM_RATE_LIMIT_WINDOW', 60))
+
+    # /chat response cache (set RESPONSE_CACHE_DB to share entries across workers)
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 512))
+    RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 3600))
+    RESPONSE_CACHE_DB = os.getenv('RESPONSE_CACHE_DB', '')
+    RESPONSE_CACHE_DISK_SIZE = int(os.getenv('RESPONSE_CACHE_DISK_SIZE', 5000))
+
+    # Pre-generated quiz pool for /api/generate-quiz/<subject>
+    QUIZ_POOL_SIZE = int(os.getenv('QUIZ_POOL_SIZE', 3))
+    QUIZ_POOL_RETRY_DELAY = float(os.getenv('QUIZ_POOL_RETRY_DELAY', 15))
+    QUIZ_POOL_MAX_RETRIES = int(os.getenv('QUIZ_POOL_MAX_RETRIES', 3))
+    # Refills wait while fewer upstream calls than this are left in the window
+    QUIZ_POOL_UPSTREAM_RESERVE = float(os.getenv('QUIZ_POOL_UPSTREAM_RESERVE', 5))
+    QUIZ_POOL_PREWARM = os.getenv('QUIZ_POOL_PREWARM', 'False').lower() == 'true'
+    QUIZ_BATCH_MAX_SUBJECTS = int(os.getenv('QUIZ_BATCH_MAX_SUBJECTS', 10))
+
+    # Map-reduce summarization of long video transcripts
+    TRANSCRIPT_CHUNK_TOKENS = int(os.getenv('TRANSCRIPT_CHUNK_TOKENS', 3000))
+    TRANSCRIPT_MAP_WORKERS = int(os.getenv('TRANSCRIPT_MAP_WORKERS', 4))
+    TRANSCRIPT_MAX_CHUNKS = int(os.getenv('TRANSCRIPT_MAX_CHUNKS', 8))
+    TRANSCRIPT_CHUNK_TTL = float(os.getenv('TRANSCRIPT_CHUNK_TTL', 7 * 86400))
+    TRANSCRIPT_DB = os.getenv('TRANSCRIPT_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'transcripts.db'))
+
+    # Per-user /chat conversation sessions
+    CONVERSATION_MAX_TURNS = int(os.getenv('CONVERSATION_MAX_TURNS', 12))
+    CONVERSATION_TOKEN_BUDGET = int(os.getenv('CONVERSATION_TOKEN_BUDGET', 1500))
+    CONVERSATION_TTL = float(os.getenv('CONVERSATION_TTL', 1800))
+    CONVERSATION_MAX_SESSIONS = int(os.getenv('CONVERSATION_MAX_SESSIONS', 2000))
+
+    # Background jobs for slow LLM work (results shared by all workers through a SQLite file)
+    JOB_DB = os.getenv('JOB_DB', os.path.join(tempfile.gettempdir(), 'ai_tutor_jobs.db'))
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+    JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', 100))
+    JOB_RESULT_TTL = float(os.getenv('JOB_RESULT_TTL', 3600))
+    JOB_MAX_WAIT = float(os.getenv('JOB_MAX_WAIT', 25))
+
+    # Gemini usage accounting (prices in USD per million tokens, for cost estimates)
+    USAGE_MAX_USERS = int(os.getenv('USAGE_MAX_USERS', 1000))
+    GEMINI_INPUT_PRICE_PER_M = float(os.getenv('GEMINI_INPUT_PRICE_PER_M', 0.10))
+    GEMINI_OUTPUT_PRICE_PER_M = float(os.getenv('GEMINI_OUTPUT_PRICE_PER_M', 0.40))
+
+    # OCR process pool shared by the image routes
+    MAX_IMAGE_UPLOAD_BYTES = int(os.getenv('MAX_IMAGE_UPLOAD_BYTES', 10 * 1024 * 1024))
+    OCR_WORKERS = int(os.getenv('OCR_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    OCR_QUEUE_SIZE = int(os.getenv('OCR_QUEUE_SIZE', 16))
+    OCR_TIMEOUT = float(os.getenv('OCR_TIMEOUT', 20))
+    OCR_LANG = os.getenv('OCR_LANG', 'eng')
+    OCR_START_METHOD = os.getenv('OCR_START_METHOD', 'spawn')
+    OCR_ENGINE = os.getenv('OCR_ENGINE', 'auto')  # auto (tesserocr if installed), tesserocr or pytesseract
+    OCR_TESSDATA_PATH = os.getenv('OCR_TESSDATA_PATH', '')
+    TESSERACT_CMD = os.getenv('TESSERACT_CMD', '')  # checked before the usual install locations
+    OCR_TILING = os.getenv('OCR_TILING', 'True').lower() == 'true'
+    OCR_TILE_MIN_PIXELS = int(os.getenv('OCR_TILE_MIN_PIXELS', 2_000_000))
+    OCR_TILES_PER_WORKER = int(os.getenv('OCR_TILES_PER_WORKER', 2))
+    OCR_CACHE_SIZE = int(os.getenv('OCR_CACHE_SIZE', 256))
+    OCR_CACHE_TTL = float(os.getenv('OCR_CACHE_TTL', 7 * 86400))
+    OCR_CACHE_DB = os.getenv('OCR_CACHE_DB', '')
+    # Multi-page / PDF batches on /analyze-pages
+    OCR_BATCH_MAX_PAGES = int(os.getenv('OCR_BATCH_MAX_PAGES', 30))
+    MAX_BATCH_UPLOAD_BYTES = int(os.getenv('MAX_BATCH_UPLOAD_BYTES', 40 * 1024 * 1024))
+    OCR_PDF_DPI = int(os.getenv('OCR_PDF_DPI', 200))
+    OCR_BATCH_PROMPT_CHARS = int(os.getenv('OCR_BATCH_PROMPT_CHARS', 12000))
+
     # File Storage Configuration
     REPORTS_DIR = os.getenv('REPORTS_DIR', 'reports')
     UPLOAD_DIR = os.getenv('UPLOAD_DIR', 'uploads')
@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from transcript_summarizer import estimate_tokens
+
+
+class _Session:
+    """Recent turns of one user's conversation plus a rolling summary of older ones"""
+
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)
+        self.folding = []
+        self.summary = ""
+        self.fold_pending = False
+        self.updated_at = time.monotonic()
+
+    def tokens(self):
+        return (estimate_tokens(self.summary)
+                + sum(estimate_tokens(user) + estimate_tokens(reply) for user, reply in self.folding)
+                + sum(estimate_tokens(user) + estimate_tokens(reply) for user, reply in self.turns))
+
+
+class ConversationMemory:
+    """Per-identity /chat history kept within a token budget.
+
+    Each session is a ring buffer of the last max_turns (message, reply)
+    pairs. When a session grows past token_budget, the oldest turns are
+    folded into a rolling summary on a background thread so the request
+    never waits for it. Sessions idle for ttl seconds are dropped, and at
+    most max_sessions are kept per worker (least recently used go first).
+    """
+
+    SUMMARY_PROMPT = ("Update this running summary of a tutoring conversation with the new exchanges. "
+                      "Keep the topics, the student's level and any open questions; at most 150 words.\n\n"
+                      "Summary so far:\n{summary}\n\nNew exchanges:\n{turns}")
+
+    def __init__(self, summarize, max_turns: int = None, token_budget: int = None,
+                 ttl: float = None, max_sessions: int = None, max_turn_chars: int = 2000):
+        """summarize(prompt) -> summary text; raises on failure"""
+        self.summarize = summarize
+        self.max_turns = max_turns or Config.CONVERSATION_MAX_TURNS
+        self.token_budget = token_budget or Config.CONVERSATION_TOKEN_BUDGET
+        self.ttl = ttl or Config.CONVERSATION_TTL
+        self.max_sessions = max_sessions or Config.CONVERSATION_MAX_SESSIONS
+        self.max_turn_chars = max_turn_chars
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='conversation-summary')
+        self.summaries = 0
+        self.summary_failures = 0
+        self.evicted = 0
+
+    def _get_session(self, identity, create):
+        """Look up a live session, dropping expired ones (lock held)"""
+        now = time.monotonic()
+        while self._sessions:
+            oldest_identity, oldest = next(iter(self._sessions.items()))
+            if now - oldest.updated_at <= self.ttl:
+                break
+            del self._sessions[oldest_identity]
+            self.evicted += 1
+
+        session = self._sessions.get(identity)
+        if session is None and create:
+            session = _Session(self.max_turns)
+            self._sessions[identity] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+        if session is not None:
+            session.updated_at = now
+            self._sessions.move_to_end(identity)
+        return session
+
+    def build_prompt(self, identity: str, prompt: str) -> str:
+        """Prefix prompt with the conversation so far; unchanged for a new conversation"""
+        with self._lock:
+            session = self._get_session(identity, create=False)
+            if session is None:
+                return prompt
+            summary = session.summary
+            turns = list(session.folding) + list(session.turns)
+
+        if not summary and not turns:
+            return prompt
+        sections = []
+        if summary:
+            sections.append(f"Summary of the earlier conversation:\n{summary}")
+        if turns:
+            sections.append("Recent messages:\n" + self._format_turns(turns))
+        history = "\n\n".join(sections)
+        return f"You are continuing a tutoring conversation.\n\n{history}\n\nStudent's new message:\n{prompt}"
+
+    def record(self, identity: str, message: str, reply: str):
+        """Append a turn and start folding old turns into the summary if over budget"""
+        turn = (message[:self.max_turn_chars], reply[:self.max_turn_chars])
+        with self._lock:
+            session = self._get_session(identity, create=True)
+            if len(session.turns) == session.turns.maxlen:
+                # The ring buffer is full; keep the turn that is about to drop out for the summary
+                session.folding.append(session.turns[0])
+            session.turns.append(turn)
+            if session.fold_pending or session.tokens() <= self.token_budget:
+                return
+            # Fold the older half of the buffer, keeping the latest exchanges verbatim
+            keep = max(1, len(session.turns) // 2)
+            while len(session.turns) > keep:
+                session.folding.append(session.turns.popleft())
+            session.fold_pending = True
+        self._summarizer.submit(self._fold, session)
+
+    def _fold(self, session):
+        with self._lock:
+            summary = session.summary
+            folding = list(session.folding)
+        prompt = self.SUMMARY_PROMPT.format(summary=summary or "(none)", turns=self._format_turns(folding))
+        try:
+            new_summary = self.summarize(prompt)
+        except Exception as e:
+            print(f"Conversation summary error: {e}")
+            with self._lock:
+                self.summary_failures += 1
+            # Keep the tail of the old text so the session still stays within its budget
+            new_summary = (summary + "\n" + self._format_turns(folding))[-self.token_budget * 2:]
+        with self._lock:
+            self.summaries += 1
+            session.summary = new_summary
+            session.folding = session.folding[len(folding):]
+            session.fold_pending = False
+
+    def reset(self, identity: str):
+        """Forget identity's conversation"""
+        with self._lock:
+            self._sessions.pop(identity, None)
+
+    @staticmethod
+    def _format_turns(turns):
+        return "\n".join(f"Student: {user}\nTutor: {reply}" for user, reply in turns)
+
+    def stats(self) -> dict:
+        """Return session counters for the metrics endpoint"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'token_budget': self.token_budget,
+                'summaries': self.summaries,
+                'summary_failures': self.summary_failures,
+                'evicted': self.evicted
+            }
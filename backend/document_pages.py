@@ -0,0 +1,113 @@
+import io
+from flask import request
+from config import Config
+from image_upload import ImageUploadError, _read_bounded
+try:
+    import pypdfium2 as pdfium
+    PDF_AVAILABLE = True
+except ImportError:
+    PDF_AVAILABLE = False
+    print("Warning: pypdfium2 not available. PDF uploads will be rejected.")
+
+PDF_MAGIC = b'%PDF-'
+
+
+def is_pdf(data: bytes) -> bool:
+    return data[:1024].lstrip().startswith(PDF_MAGIC)
+
+
+def _open_pdf(pdf_bytes: bytes):
+    if not PDF_AVAILABLE:
+        raise ImageUploadError("PDF support is not installed on the server", 415)
+    try:
+        return pdfium.PdfDocument(pdf_bytes)
+    except Exception as e:
+        raise ImageUploadError(f"Could not read PDF: {e}")
+
+
+def pdf_page_count(pdf_bytes: bytes) -> int:
+    document = _open_pdf(pdf_bytes)
+    try:
+        return len(document)
+    finally:
+        document.close()
+
+
+def iter_pdf_pages(pdf_bytes: bytes, dpi: int = None):
+    """Render each PDF page to PNG bytes at dpi (tesseract reads best around 200-300 DPI), one page at a time"""
+    dpi = dpi or Config.OCR_PDF_DPI
+    document = _open_pdf(pdf_bytes)
+    try:
+        for index in range(len(document)):
+            page = document[index]
+            try:
+                image = page.render(scale=dpi / 72, grayscale=True).to_pil()
+            finally:
+                page.close()
+            buffer = io.BytesIO()
+            image.save(buffer, format='PNG')
+            yield buffer.getvalue()
+    finally:
+        document.close()
+
+
+def iter_pages(blobs, dpi: int = None):
+    """Yield one image per page: images as sent, PDFs rendered page by page as they're consumed"""
+    for blob in blobs:
+        if is_pdf(blob):
+            yield from iter_pdf_pages(blob, dpi)
+        else:
+            yield blob
+
+
+def _read_parts(streams, max_bytes: int):
+    """Read each stream in full while keeping their total within max_bytes, whatever Content-Length claimed"""
+    blobs = []
+    remaining = max_bytes
+    for stream in streams:
+        try:
+            blob = _read_bounded(stream, remaining)
+        except ImageUploadError:
+            raise ImageUploadError(f"Upload is larger than {max_bytes // (1024 * 1024)} MB", 413) from None
+        remaining -= len(blob)
+        if blob:
+            blobs.append(blob)
+    return blobs
+
+
+def read_page_uploads(max_pages: int = None, max_bytes: int = None):
+    """Return (blobs, page_count, fields) for a batch OCR request.
+
+    Accepts multipart/form-data with any number of image or PDF files (in
+    the order sent; PDFs expand to one image per page), or a single raw
+    image/* or application/pdf body with other fields in the query string.
+    The upload is read and its page count checked here; pass blobs to
+    iter_pages() to render PDF pages only as the OCR pool is ready for them.
+    """
+    max_pages = max_pages or Config.OCR_BATCH_MAX_PAGES
+    max_bytes = max_bytes or Config.MAX_BATCH_UPLOAD_BYTES
+    if request.content_length and request.content_length > max_bytes:
+        raise ImageUploadError(f"Upload is larger than {max_bytes // (1024 * 1024)} MB", 413)
+
+    mimetype = request.mimetype or ''
+    if mimetype == 'multipart/form-data':
+        blobs = _read_parts((upload.stream for _, upload in request.files.items(multi=True)), max_bytes)
+        fields = request.form.to_dict()
+    elif mimetype.startswith('image/') or mimetype in ('application/pdf', 'application/octet-stream'):
+        blobs = _read_parts([request.stream], max_bytes)
+        fields = request.args.to_dict()
+    else:
+        raise ImageUploadError("Send the pages as multipart/form-data files or as a raw image or PDF body", 415)
+
+    page_count = 0
+    for blob in blobs:
+        if is_pdf(blob):
+            pages = pdf_page_count(blob)
+            if page_count + pages > max_pages:
+                raise ImageUploadError(f"PDF has {pages} pages; only {max_pages - page_count} more fit in this request", 413)
+            page_count += pages
+        else:
+            page_count += 1
+        if page_count > max_pages:
+            raise ImageUploadError(f"Too many pages: at most {max_pages} per request", 413)
+    return blobs, page_count, fields
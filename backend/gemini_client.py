@@ -0,0 +1,236 @@
+import json
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+from upstream_executor import UpstreamExecutor
+from circuit_breaker import CircuitBreaker
+from gemini_router import GeminiRouter
+from usage_tracker import usage_tracker
+
+
+class GeminiError(Exception):
+    """Raised when a Gemini call fails after all retries"""
+
+
+class GeminiRateLimitError(GeminiError):
+    """Raised when Gemini keeps answering 429 after all retries"""
+
+
+class GeminiCircuitOpenError(GeminiError):
+    """Raised without calling Gemini while the circuit breaker is open"""
+
+
+class GeminiClient:
+    """Shared Gemini client backed by a pooled keep-alive requests.Session.
+
+    Every LLM route goes through one instance so connections to
+    generativelanguage.googleapis.com are reused instead of paying a new
+    TCP+TLS handshake per request, and the retry policy lives in one place.
+    Each attempt asks the router for an endpoint, so a retry after a 429
+    moves to another key or model.
+    """
+
+    def __init__(self, router: GeminiRouter = None, pool_connections: int = None, pool_maxsize: int = None,
+                 timeout: float = None, connect_timeout: float = None,
+                 deadline: float = None, executor: UpstreamExecutor = None, breaker: CircuitBreaker = None):
+        self.router = router or GeminiRouter()
+        self.timeout = timeout or Config.GEMINI_TIMEOUT
+        self.connect_timeout = connect_timeout or Config.GEMINI_CONNECT_TIMEOUT
+        self.deadline = deadline or Config.UPSTREAM_DEADLINE
+        self.executor = executor or UpstreamExecutor()
+        self.breaker = breaker or CircuitBreaker()
+
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections or Config.GEMINI_POOL_CONNECTIONS,
+            pool_maxsize=pool_maxsize or Config.GEMINI_POOL_MAXSIZE
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Connection": "keep-alive"
+        })
+
+    def _attempt(self, task: str, body: dict, read_timeout: float, stream: bool, call: dict = None):
+        """Make one POST attempt on the best endpoint for task; raises a GeminiError the executor may retry"""
+        endpoint = self.router.acquire(task)
+        if call is not None:
+            call['attempts'] += 1
+            call['endpoint'] = endpoint.name
+        started = time.monotonic()
+        try:
+            response = self._send(endpoint.url(stream), body, read_timeout, stream)
+        except GeminiRateLimitError:
+            latency = time.monotonic() - started
+            self.router.release(endpoint, latency, ok=False, rate_limited=True)
+            self.breaker.record_failure(latency)
+            raise
+        except GeminiError:
+            latency = time.monotonic() - started
+            self.router.release(endpoint, latency, ok=False)
+            self.breaker.record_failure(latency)
+            raise
+        latency = time.monotonic() - started
+        self.router.release(endpoint, latency, ok=True)
+        self.breaker.record_success(latency)
+        return response
+
+    def _send(self, url, body, read_timeout, stream):
+        try:
+            response = self.session.post(
+                url,
+                data=json.dumps(body),
+                timeout=(self.connect_timeout, read_timeout),
+                verify=True,
+                stream=stream
+            )
+        except requests.exceptions.SSLError as e:
+            print(f"SSL Error: {str(e)}")
+            raise GeminiError(f"SSL connection error: {str(e)}")
+        except requests.exceptions.RequestException as e:
+            print(f"Request error: {str(e)}")
+            raise GeminiError(f"Network error: {str(e)}")
+
+        if response.status_code == 429:
+            print("Rate limited by Gemini, scheduling retry...")
+            response.close()
+            raise GeminiRateLimitError("API rate limit exceeded. Please try again later.")
+
+        try:
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Request error: {str(e)}")
+            response.close()
+            raise GeminiError(f"Network error: {str(e)}")
+        return response
+
+    def submit(self, body: dict, task: str = None, timeout: float = None, stream: bool = False, call: dict = None):
+        """Queue a POST on the upstream executor and return a Future for the response"""
+        read_timeout = timeout or self.timeout
+        return self.executor.submit(lambda: self._attempt(task, body, read_timeout, stream, call),
+                                    retry_on=(GeminiError,))
+
+    def _post(self, body: dict, task: str = None, timeout: float = None, stream: bool = False, call: dict = None):
+        """POST body under the shared retry policy and wait for the response.
+
+        Retries run on the executor's timer, not in this thread; the caller
+        only waits up to the overall request deadline.
+        """
+        # Fail fast while Gemini is degraded so routes can fall back locally
+        if not self.breaker.allow_request():
+            raise GeminiCircuitOpenError("The AI service is temporarily unavailable. Please try again shortly.")
+
+        future = self.submit(body, task=task, timeout=timeout, stream=stream, call=call)
+        try:
+            return future.result(timeout=self.deadline)
+        except FutureTimeoutError:
+            future.cancel()
+            self.breaker.record_failure(self.deadline)
+            raise GeminiError("Network error: upstream request deadline exceeded")
+
+    @staticmethod
+    def _start_call() -> dict:
+        """Accounting state for one logical call, labelled from the calling thread"""
+        return {'attempts': 0, 'endpoint': None, 'labels': usage_tracker.current_labels(), 'started': time.monotonic()}
+
+    def _account(self, call, task, body, ok, response_chars=0, usage=None):
+        """Record a finished call with the usage tracker; calls refused by the breaker spend nothing"""
+        if call['attempts'] == 0:
+            return
+        prompt_chars = sum(len(part.get('text', ''))
+                           for content in body.get('contents', [])
+                           for part in content.get('parts', []))
+        usage_tracker.record(call['labels'], task, call['endpoint'], prompt_chars, response_chars, usage,
+                             time.monotonic() - call['started'], call['attempts'] - 1, ok)
+
+    def generate_content(self, body: dict, task: str = None, timeout: float = None) -> dict:
+        """POST a generateContent body and return the decoded JSON response"""
+        call = self._start_call()
+        try:
+            result = self._post(body, task=task, timeout=timeout, call=call).json()
+        except GeminiError:
+            self._account(call, task, body, ok=False)
+            raise
+        self._account(call, task, body, ok='candidates' in result,
+                      response_chars=len(self.extract_text(result) or ''), usage=result.get('usageMetadata'))
+        return result
+
+    def stream_content(self, body: dict, task: str = None, timeout: float = None):
+        """POST a streamGenerateContent body and yield each decoded SSE chunk.
+
+        Retries only cover the request itself; once the first chunk has been
+        yielded a failure is raised to the caller as a GeminiError.
+        """
+        call = self._start_call()
+        try:
+            response = self._post(body, task=task, timeout=timeout, stream=True, call=call)
+        except GeminiError:
+            self._account(call, task, body, ok=False)
+            raise
+        ok, response_chars, usage = False, 0, None
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                chunk = json.loads(line[len('data:'):].strip())
+                response_chars += len(self.extract_text(chunk) or '')
+                usage = chunk.get('usageMetadata', usage)
+                yield chunk
+            ok = True
+        except requests.exceptions.RequestException as e:
+            raise GeminiError(f"Network error: {str(e)}")
+        finally:
+            response.close()
+            self._account(call, task, body, ok=ok, response_chars=response_chars, usage=usage)
+
+    def stream_text(self, prompt: str, task: str = None, timeout: float = None, generation_config: dict = None):
+        """Yield the text of a single-turn prompt piece by piece as Gemini generates it"""
+        body = self.text_body(prompt, generation_config)
+        for chunk in self.stream_content(body, task=task, timeout=timeout):
+            text = self.extract_text(chunk)
+            if text is None and 'error' in chunk:
+                raise GeminiError(f"Error: {self.error_message(chunk)}")
+            if text:
+                yield text
+
+    def generate_text(self, prompt: str, task: str = None, timeout: float = None,
+                      generation_config: dict = None) -> dict:
+        """Send a single-turn text prompt and return the decoded JSON response.
+
+        task (a /chat action such as 'quiz' or 'code') steers the router's model choice;
+        generation_config is passed through, e.g. to request JSON output with a schema.
+        """
+        return self.generate_content(self.text_body(prompt, generation_config), task=task, timeout=timeout)
+
+    @staticmethod
+    def text_body(prompt: str, generation_config: dict = None) -> dict:
+        """Build a generateContent body for a single-turn text prompt"""
+        body = {
+            "contents": [
+                {
+                    "parts": [{"text": prompt}]
+                }
+            ]
+        }
+        if generation_config:
+            body["generationConfig"] = generation_config
+        return body
+
+    @staticmethod
+    def extract_text(result: dict):
+        """Return the first candidate's text, or None if the response has no candidates"""
+        if "candidates" in result:
+            parts = result["candidates"][0].get("content", {}).get("parts", [])
+            return "".join(part.get("text", "") for part in parts)
+        return None
+
+    @staticmethod
+    def error_message(result: dict) -> str:
+        """Return the API error message carried by a response without candidates"""
+        return result.get('error', {}).get('message', 'Unknown error')
+
+
+gemini_client = GeminiClient()
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import deque
+from config import Config
+
+
+class GeminiEndpoint:
+    """One API key + model pair and its observed health"""
+
+    def __init__(self, name: str, api_key: str, model: str, tier: str):
+        self.name = name
+        self.api_key = api_key
+        self.model = model
+        self.tier = tier
+        self.ewma_latency = None
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.recent_429s = deque()
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    def url(self, stream: bool = False) -> str:
+        if stream:
+            return f"{Config.GEMINI_API_BASE}/models/{self.model}:streamGenerateContent?alt=sse&key={self.api_key}"
+        return f"{Config.GEMINI_API_BASE}/models/{self.model}:generateContent?key={self.api_key}"
+
+
+class GeminiRouter:
+    """Pick the best Gemini endpoint for each call.
+
+    Endpoints are every configured API key crossed with every configured
+    model. Each keeps an EWMA of its latency and a window of recent 429s; an
+    endpoint that was just rate limited cools down (longer for repeated
+    429s) so its quota recovers while traffic moves to the other keys. Tasks
+    prefer a tier: quiz and summarize go to the fast models, code to the
+    heavy ones, and anything else to whichever endpoint is quickest.
+    """
+
+    TASK_TIERS = {'quiz': 'fast', 'summarize': 'fast', 'code': 'heavy'}
+
+    def __init__(self, endpoints=None, alpha: float = None, cooldown: float = None, window: float = 60):
+        self.endpoints = endpoints or self.from_config()
+        self.alpha = alpha or Config.GEMINI_ROUTER_EWMA_ALPHA
+        self.cooldown = cooldown or Config.GEMINI_ROUTER_COOLDOWN
+        self.window = window
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_config():
+        """Build endpoints from GEMINI_API_KEYS x GEMINI_FAST_MODELS / GEMINI_HEAVY_MODELS"""
+        endpoints = []
+        for tier, models in (('fast', Config.GEMINI_FAST_MODELS), ('heavy', Config.GEMINI_HEAVY_MODELS)):
+            for model in models:
+                for i, key in enumerate(Config.GEMINI_API_KEYS):
+                    endpoints.append(GeminiEndpoint(f"{model}#key{i + 1}", key, model, tier))
+        return endpoints
+
+    def _score(self, endpoint):
+        # Unmeasured endpoints score 0 so each one gets tried; busy ones are penalised
+        latency = endpoint.ewma_latency or 0.0
+        return latency * (1 + endpoint.in_flight) * (1 + len(endpoint.recent_429s))
+
+    def cache_scope(self, task: str = None) -> str:
+        """Name the models that may answer task, for keying cached replies.
+
+        Replies are cached per tier, not per fixed model, so an answer is only
+        reused for a task the same tier would have served.
+        """
+        tier = self.TASK_TIERS.get(task)
+        models = sorted({e.model for e in self.endpoints if tier is None or e.tier == tier})
+        return f"{tier or 'any'}:{','.join(models)}"
+
+    def acquire(self, task: str = None) -> GeminiEndpoint:
+        """Choose an endpoint for task and count the call as in flight"""
+        tier = self.TASK_TIERS.get(task)
+        now = time.monotonic()
+        with self._lock:
+            ready = [e for e in self.endpoints if e.cooldown_until <= now]
+            preferred = [e for e in ready if tier is None or e.tier == tier]
+            # Fall back to the other tier, then to the endpoint whose cooldown ends first
+            candidates = preferred or ready
+            if candidates:
+                endpoint = min(candidates, key=self._score)
+            else:
+                endpoint = min(self.endpoints, key=lambda e: e.cooldown_until)
+            endpoint.in_flight += 1
+            endpoint.calls += 1
+            return endpoint
+
+    def release(self, endpoint: GeminiEndpoint, latency: float, ok: bool, rate_limited: bool = False):
+        """Record the outcome of a call made on endpoint"""
+        now = time.monotonic()
+        with self._lock:
+            endpoint.in_flight = max(0, endpoint.in_flight - 1)
+            while endpoint.recent_429s and now - endpoint.recent_429s[0] > self.window:
+                endpoint.recent_429s.popleft()
+            if rate_limited:
+                endpoint.rate_limited += 1
+                endpoint.recent_429s.append(now)
+                endpoint.cooldown_until = now + self.cooldown * 2 ** (len(endpoint.recent_429s) - 1)
+                return
+            if not ok:
+                endpoint.errors += 1
+            if endpoint.ewma_latency is None:
+                endpoint.ewma_latency = latency
+            else:
+                endpoint.ewma_latency = self.alpha * latency + (1 - self.alpha) * endpoint.ewma_latency
+
+    def stats(self) -> dict:
+        """Return per-endpoint health for the metrics endpoint"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                endpoint.name: {
+                    'model': endpoint.model,
+                    'tier': endpoint.tier,
+                    'ewma_latency': round(endpoint.ewma_latency, 3) if endpoint.ewma_latency is not None else None,
+                    'in_flight': endpoint.in_flight,
+                    'calls': endpoint.calls,
+                    'errors': endpoint.errors,
+                    'rate_limited': endpoint.rate_limited,
+                    'recent_429s': len(endpoint.recent_429s),
+                    'cooling_down_for': round(max(0.0, endpoint.cooldown_until - now), 1)
+                }
+                for endpoint in self.endpoints
+            }
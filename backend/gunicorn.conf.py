@@ -0,0 +1,9 @@
+import os
+
+# Picked up automatically by `gunicorn app:app` when started from this directory.
+# Threaded workers: a request waiting on an upstream Gemini call holds one
+# thread instead of a whole worker process.
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
@@ -0,0 +1,174 @@
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+
+# Per analysis_type pipelines. max_dimension caps the long side (phone photos are
+# 3000-4000px; tesseract is fastest and most accurate around 300 DPI for a page),
+# min_dimension upscales small screenshots, binarize uses a local-mean threshold
+# and deskew corrects small camera rotations.
+PROFILES = {
+    'default': {'max_dimension': 2000, 'min_dimension': 1000, 'binarize': True, 'deskew': True},
+    'educational': {'max_dimension': 2000, 'min_dimension': 1000, 'binarize': True, 'deskew': True},
+    # Diagrams have thin coloured lines that a hard threshold can erase
+    'diagram': {'max_dimension': 2000, 'min_dimension': 1000, 'binarize': False, 'deskew': False},
+    # Code is usually a straight screenshot; keep indentation with --psm 6
+    'code': {'max_dimension': 2400, 'min_dimension': 1200, 'binarize': True, 'deskew': False,
+             'tesseract_config': '--psm 6 -c preserve_interword_spaces=1'},
+    'none': {}
+}
+
+
+def get_profile(name):
+    return PROFILES.get(name or 'default', PROFILES['default'])
+
+
+def resize_for_ocr(image, max_dimension=None, min_dimension=None):
+    """Scale the long side into [min_dimension, max_dimension]"""
+    long_side = max(image.size)
+    scale = 1.0
+    if max_dimension and long_side > max_dimension:
+        scale = max_dimension / long_side
+    elif min_dimension and long_side < min_dimension:
+        scale = min(2.0, min_dimension / long_side)
+    if scale == 1.0:
+        return image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.LANCZOS if scale < 1 else Image.BICUBIC)
+
+
+def adaptive_binarize(gray, window=31, offset=10):
+    """Local-mean threshold computed with an integral image.
+
+    Each pixel is compared with the mean of the window around it, so uneven
+    lighting across a photographed page doesn't wipe out half the text.
+    """
+    pixels = np.asarray(gray, dtype=np.float32)
+    height, width = pixels.shape
+    half = window // 2
+    padded = np.pad(pixels, half + 1, mode='edge')
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    y0, x0 = np.arange(height), np.arange(width)
+    y1, x1 = y0 + window, x0 + window
+    sums = (integral[y1[:, None], x1[None, :]] - integral[y0[:, None], x1[None, :]]
+            - integral[y1[:, None], x0[None, :]] + integral[y0[:, None], x0[None, :]])
+    means = sums / (window * window)
+    binary = np.where(pixels > means - offset, 255, 0).astype(np.uint8)
+    return Image.fromarray(binary)
+
+
+def estimate_skew(gray, max_angle=5.0, step=0.5):
+    """Angle (degrees) that makes text rows line up, found by maximising row-profile variance"""
+    # Score on a small inverted copy: ink is high, background 0
+    small = ImageOps.invert(gray)
+    small.thumbnail((600, 600))
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        rotated = np.asarray(small.rotate(float(angle), resample=Image.BILINEAR, fillcolor=0), dtype=np.float32)
+        profile = rotated.sum(axis=1)
+        score = float(np.var(np.diff(profile)))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def preprocess(image, profile_name='default'):
+    """Prepare a decoded PIL image for tesseract according to a named profile"""
+    profile = get_profile(profile_name)
+    if not profile:
+        return image
+    image = ImageOps.exif_transpose(image)
+    image = resize_for_ocr(image, profile.get('max_dimension'), profile.get('min_dimension'))
+    image = image.convert('L')
+    if profile.get('deskew'):
+        angle = estimate_skew(image)
+        if angle:
+            image = image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    if profile.get('binarize'):
+        # A 3x3 median removes sensor noise that would otherwise threshold into speckles
+        image = adaptive_binarize(image.filter(ImageFilter.MedianFilter(3)))
+    return image
+
+
+def _gaps(has_ink, min_gap):
+    """(start, end) runs of blank rows/columns at least min_gap long, ignoring the edges"""
+    gaps = []
+    start = None
+    for i, ink in enumerate(has_ink):
+        if not ink and start is None:
+            start = i
+        elif ink and start is not None:
+            if start > 0 and i - start >= min_gap:
+                gaps.append((start, i))
+            start = None
+    return gaps
+
+
+def find_text_blocks(image, max_blocks=8, min_gap=None):
+    """Split a page into text blocks in reading order with a recursive XY-cut.
+
+    Row and column projection profiles of the ink are cut at blank runs:
+    at each level the direction with the widest gap wins (so a column
+    gutter splits before the paragraphs inside it), and within it the wide
+    gap closest to the middle, to keep blocks balanced. Regions smaller than
+    1/max_blocks of the page are not split further, and no cut ever passes
+    through a line of text. Returns (left, top, right, bottom) boxes.
+    """
+    gray = image.convert('L')
+    ink = np.asarray(gray, dtype=np.uint8) < 128
+    if not ink.mean() < 0.5:
+        # White text on a dark board
+        ink = ~ink
+    height, width = ink.shape
+    min_gap = min_gap or max(4, min(height, width) // 150)
+    target_area = height * width / max(1, max_blocks)
+    blocks = []
+
+    def profiles(region):
+        # A row or column only counts as ink above ~1% coverage, so speckles and
+        # the thin edge of a photographed page don't bridge every gap
+        rows = region.sum(axis=1) > max(2, region.shape[1] // 100)
+        cols = region.sum(axis=0) > max(2, region.shape[0] // 100)
+        return rows, cols
+
+    def cut(top, bottom, left, right):
+        has_rows, has_cols = profiles(ink[top:bottom, left:right])
+        rows, cols = np.flatnonzero(has_rows), np.flatnonzero(has_cols)
+        if not len(rows) or not len(cols):
+            return
+        top, bottom = top + int(rows[0]), top + int(rows[-1]) + 1
+        left, right = left + int(cols[0]), left + int(cols[-1]) + 1
+        if (bottom - top) * (right - left) <= target_area:
+            blocks.append((left, top, right, bottom))
+            return
+
+        has_rows, has_cols = profiles(ink[top:bottom, left:right])
+        row_gaps, col_gaps = _gaps(has_rows, min_gap), _gaps(has_cols, min_gap)
+        widest_row = max((end - start for start, end in row_gaps), default=0)
+        widest_col = max((end - start for start, end in col_gaps), default=0)
+        if not widest_row and not widest_col:
+            blocks.append((left, top, right, bottom))
+            return
+
+        vertical = widest_col > widest_row
+        gaps, widest, length = (col_gaps, widest_col, right - left) if vertical else (row_gaps, widest_row, bottom - top)
+        candidates = [gap for gap in gaps if gap[1] - gap[0] >= widest / 2]
+        start, end = min(candidates, key=lambda gap: abs((gap[0] + gap[1]) / 2 - length / 2))
+        split = (start + end) // 2
+        if vertical:
+            cut(top, bottom, left, left + split)
+            cut(top, bottom, left + split, right)
+        else:
+            cut(top, top + split, left, right)
+            cut(top + split, bottom, left, right)
+
+    cut(0, height, 0, width)
+    return blocks
+
+
+def crop_blocks(image, blocks, padding=12):
+    """Crop each block with a white margin so tesseract sees clean edges"""
+    tiles = []
+    for left, top, right, bottom in blocks:
+        tile = image.crop((max(0, left - padding), max(0, top - padding),
+                           min(image.width, right + padding), min(image.height, bottom + padding)))
+        tiles.append(tile)
+    return tiles
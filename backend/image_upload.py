@@ -0,0 +1,71 @@
+import base64
+import binascii
+from flask import request
+from config import Config
+
+
+class ImageUploadError(Exception):
+    """Raised when a request doesn't carry a usable image; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def is_binary_upload():
+    """True when the image arrives as multipart form data or a raw image body rather than JSON"""
+    mimetype = request.mimetype or ''
+    return mimetype == 'multipart/form-data' or mimetype.startswith('image/') or mimetype == 'application/octet-stream'
+
+
+def _read_bounded(stream, max_bytes):
+    data = stream.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ImageUploadError(f"Image is larger than {max_bytes // (1024 * 1024)} MB", 413)
+    return data
+
+
+def read_image_upload(field: str = 'image', max_bytes: int = None):
+    """Return (image_bytes, fields) from the current request.
+
+    Accepts three forms:
+    - multipart/form-data with the image in `field` (werkzeug spools large
+      parts to a temporary file instead of holding them in memory);
+    - a raw image body (Content-Type image/* or application/octet-stream),
+      with any other fields in the query string;
+    - the original JSON body with a base64 data URL in `field`.
+
+    The binary forms are read once, straight into the bytes handed to the
+    OCR pool, instead of JSON text -> base64 string -> bytes -> BytesIO.
+    image_bytes is None when no image was sent.
+    """
+    max_bytes = max_bytes or Config.MAX_IMAGE_UPLOAD_BYTES
+    mimetype = request.mimetype or ''
+
+    if is_binary_upload():
+        # Reject oversized bodies before reading anything (form fields add a little overhead)
+        if request.content_length and request.content_length > max_bytes + 64 * 1024:
+            raise ImageUploadError(f"Image is larger than {max_bytes // (1024 * 1024)} MB", 413)
+
+    if mimetype == 'multipart/form-data':
+        upload = request.files.get(field)
+        fields = request.form.to_dict()
+        if upload is None:
+            return None, fields
+        return _read_bounded(upload.stream, max_bytes), fields
+
+    if mimetype.startswith('image/') or mimetype == 'application/octet-stream':
+        data = _read_bounded(request.stream, max_bytes)
+        return (data or None), request.args.to_dict()
+
+    fields = request.get_json(silent=True) or {}
+    image_data = fields.get(field) or ''
+    if not image_data:
+        return None, fields
+    try:
+        image_bytes = base64.b64decode(image_data.split(',')[-1])
+    except (binascii.Error, ValueError):
+        raise ImageUploadError("Invalid image format")
+    if len(image_bytes) > max_bytes:
+        raise ImageUploadError(f"Image is larger than {max_bytes // (1024 * 1024)} MB", 413)
+    return image_bytes, fields
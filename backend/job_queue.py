@@ -0,0 +1,191 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+
+
+class JobQueueFullError(Exception):
+    """Raised when too many jobs are already waiting for a worker"""
+
+
+class JobQueue:
+    """Background jobs for slow LLM tasks, with results kept in SQLite.
+
+    submit() returns a job id at once and runs the task on a bounded worker
+    pool. Job state and results are written to a SQLite file shared by every
+    gunicorn worker, so a poll may land on any worker; results expire after
+    result_ttl seconds. wait() long-polls: it blocks on an in-process event
+    when the job runs here and re-reads the store otherwise.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, db_path: str = None, max_workers: int = None, max_pending: int = None,
+                 result_ttl: float = None):
+        self.db_path = db_path or Config.JOB_DB
+        self.max_pending = max_pending or Config.JOB_MAX_PENDING
+        self.result_ttl = result_ttl or Config.JOB_RESULT_TTL
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or Config.JOB_WORKERS, thread_name_prefix='job')
+        self._events = {}
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+        self.init_database()
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def init_database(self):
+        """Create the jobs table if it doesn't exist"""
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        conn = self.get_connection()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    owner TEXT,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON jobs(updated_at)')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _write(self, job_id, status, result=None, error=None):
+        conn = self.get_connection()
+        try:
+            conn.execute('UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?',
+                         (status, json.dumps(result) if result is not None else None, error, time.time(), job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def submit(self, kind: str, fn, owner: str = None) -> str:
+        """Queue fn() as a job and return its id; fn must return a JSON-serializable value"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise JobQueueFullError("Too many jobs are queued. Please try again shortly.")
+            self._pending += 1
+            self.submitted += 1
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self.get_connection()
+        try:
+            conn.execute(
+                'INSERT INTO jobs (id, kind, owner, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, kind, owner, self.QUEUED, now, now)
+            )
+            # Drop results past their TTL while we have the connection open
+            conn.execute('DELETE FROM jobs WHERE updated_at < ? AND status IN (?, ?)',
+                         (now - self.result_ttl, self.DONE, self.FAILED))
+            conn.commit()
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._events[job_id] = threading.Event()
+        self._pool.submit(self._run, job_id, fn)
+        return job_id
+
+    def _run(self, job_id, fn):
+        with self._lock:
+            self._pending -= 1
+        try:
+            self._write(job_id, self.RUNNING)
+            result = fn()
+            self._write(job_id, self.DONE, result=result)
+            with self._lock:
+                self.succeeded += 1
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            try:
+                self._write(job_id, self.FAILED, error=str(e))
+            except sqlite3.Error as write_error:
+                print(f"Job store write error: {write_error}")
+            with self._lock:
+                self.failed += 1
+        finally:
+            with self._lock:
+                event = self._events.pop(job_id, None)
+            if event:
+                event.set()
+
+    def get(self, job_id: str):
+        """Return the job as a dict, or None if it doesn't exist or has expired"""
+        conn = self.get_connection()
+        try:
+            row = conn.execute(
+                'SELECT id, kind, owner, status, result, error, created_at, updated_at FROM jobs WHERE id = ?',
+                (job_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = {
+            'job_id': row[0],
+            'kind': row[1],
+            'owner': row[2],
+            'status': row[3],
+            'created_at': datetime_iso(row[6]),
+            'updated_at': datetime_iso(row[7])
+        }
+        if row[4] is not None:
+            job['result'] = json.loads(row[4])
+        if row[5] is not None:
+            job['error'] = row[5]
+        return job
+
+    def wait(self, job_id: str, timeout: float):
+        """Return the job once it has finished or timeout seconds have passed"""
+        deadline = time.monotonic() + max(0.0, min(timeout, Config.JOB_MAX_WAIT))
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['status'] in (self.DONE, self.FAILED) or remaining <= 0:
+                return job
+            with self._lock:
+                event = self._events.get(job_id)
+            if event is not None:
+                event.wait(remaining)
+            else:
+                # Running on another worker; re-read the shared store shortly
+                time.sleep(min(0.5, remaining))
+
+    def stats(self) -> dict:
+        """Return job counters for the metrics endpoint"""
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'running_here': len(self._events) - self._pending,
+                'submitted': self.submitted,
+                'succeeded': self.succeeded,
+                'failed': self.failed,
+                'rejected': self.rejected
+            }
+
+
+def datetime_iso(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
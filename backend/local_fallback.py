@@ -0,0 +1,71 @@
+import os
+import threading
+try:
+    import aiml
+    AIML_AVAILABLE = True
+except ImportError:
+    AIML_AVAILABLE = False
+    print("Warning: aiml not available. Offline chat fallback will be limited.")
+
+AIML_FILE = os.path.join(os.path.dirname(__file__), 'AIML-chatbot', 'college-tutor.aiml')
+
+# Same keyword routing as the standalone AIML tutor in AIML-chatbot/test.py
+KEYWORD_PATTERNS = {
+    "machine learning": "EXPLAIN MACHINE LEARNING",
+    "data structures": "HELP WITH DATA STRUCTURES",
+    "job interview": "JOB INTERVIEW TIPS"
+}
+
+UNAVAILABLE_REPLY = ("The AI tutor is temporarily unavailable, so this is a limited offline answer. "
+                     "Please try again in a minute for a full explanation.")
+
+_kernel = None
+_kernel_lock = threading.Lock()
+
+
+def get_kernel():
+    """Load the college-tutor AIML kernel on first use"""
+    global _kernel
+    if not AIML_AVAILABLE or not os.path.exists(AIML_FILE):
+        return None
+    with _kernel_lock:
+        if _kernel is None:
+            kernel = aiml.Kernel()
+            kernel.verbose(False)
+            kernel.learn(AIML_FILE)
+            _kernel = kernel
+    return _kernel
+
+
+def aiml_reply(message: str):
+    """Answer message with the local AIML tutor, or None if it has nothing to say"""
+    kernel = get_kernel()
+    if kernel is None or not message:
+        return None
+    try:
+        with _kernel_lock:
+            response = kernel.respond(message)
+            if not response:
+                message_lower = message.lower()
+                for keyword, pattern in KEYWORD_PATTERNS.items():
+                    if keyword in message_lower:
+                        response = kernel.respond(pattern)
+                        break
+    except Exception as e:
+        print(f"AIML fallback error: {e}")
+        return None
+    return response or None
+
+
+def fallback_chat_reply(message: str, cached_reply=None) -> dict:
+    """Build the /chat payload served while Gemini is unavailable.
+
+    Prefers a previously cached answer for the same prompt, then the AIML
+    tutor, then a plain notice.
+    """
+    if cached_reply is not None:
+        return {"reply": cached_reply, "cached": True, "fallback": "cache"}
+    reply = aiml_reply(message)
+    if reply:
+        return {"reply": f"{reply}\n\n_{UNAVAILABLE_REPLY}_", "fallback": "aiml"}
+    return {"reply": UNAVAILABLE_REPLY, "fallback": "none"}
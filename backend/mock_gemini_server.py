@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini generateContent API, for offline benchmarks.
+
+Start it, then point the backend at it:
+
+    python mock_gemini_server.py --port 8089 --latency lognormal:1.0,0.4 --error-429 0.05
+    GEMINI_API_BASE=http://127.0.0.1:8089/v1beta gunicorn app:app
+
+Supports generateContent and streamGenerateContent (?alt=sse), configurable
+latency distributions, and 429 / 5xx injection. Quiz prompts get a valid
+quiz JSON reply so the quiz routes exercise their full parsing path.
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def parse_latency(spec):
+    """Turn a latency spec into a sampler returning seconds.
+
+    fixed:0.5 | uniform:0.2,1.5 | normal:1.0,0.3 | lognormal:1.0,0.4 (median, sigma) | exp:1.0 (mean)
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',') if v]
+    if kind == 'fixed':
+        return lambda: values[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1])
+    if kind == 'exp':
+        return lambda: random.expovariate(1 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def sample_question(n, topic):
+    return {
+        "question": f"Mock question {n} about {topic}?",
+        "options": ["Option A", "Option B", "Option C", "Option D"],
+        "correct_answer": n % 4,
+        "explanation": f"Mock explanation for question {n}."
+    }
+
+
+def mock_reply(prompt):
+    """Build a plausible reply for the prompt templates the backend sends"""
+    if 'single JSON object' in prompt:
+        subjects = re.findall(r'^- "(.+?)" \((\d+) questions\)', prompt, re.MULTILINE)
+        return json.dumps({subject: [sample_question(i, subject) for i in range(int(count))]
+                           for subject, count in subjects})
+    if 'JSON array' in prompt:
+        match = re.search(r'Generate (\d+) multiple choice', prompt)
+        count = int(match.group(1)) if match else 5
+        return json.dumps([sample_question(i, 'the subject') for i in range(count)])
+    words = prompt.split()
+    body = " ".join(words[:40])
+    return (f"Here is a mock explanation.\n\n{body}\n\n"
+            + "This paragraph pads the reply so streaming has several chunks to send. " * 6)
+
+
+def usage_metadata(prompt, reply):
+    prompt_tokens = max(1, len(prompt) // 4)
+    reply_tokens = max(1, len(reply) // 4)
+    return {
+        "promptTokenCount": prompt_tokens,
+        "candidatesTokenCount": reply_tokens,
+        "totalTokenCount": prompt_tokens + reply_tokens
+    }
+
+
+class MockGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    options = None
+    stats = {'requests': 0, 'injected_429': 0, 'injected_5xx': 0}
+    stats_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        if self.options.verbose:
+            super().log_message(format, *args)
+
+    def _count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with self.stats_lock:
+                return self._send_json(200, dict(self.stats))
+        self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        raw = self.rfile.read(length)
+        self._count('requests')
+        url = urlparse(self.path)
+
+        roll = random.random()
+        if roll < self.options.error_429:
+            self._count('injected_429')
+            return self._send_json(429, {"error": {"code": 429, "message": "Resource has been exhausted"}})
+        if roll < self.options.error_429 + self.options.error_5xx:
+            self._count('injected_5xx')
+            return self._send_json(503, {"error": {"code": 503, "message": "The model is overloaded"}})
+
+        try:
+            body = json.loads(raw or b'{}')
+            prompt = "\n".join(part.get('text', '')
+                               for content in body.get('contents', [])
+                               for part in content.get('parts', []))
+        except (ValueError, AttributeError):
+            return self._send_json(400, {"error": {"code": 400, "message": "Invalid JSON payload"}})
+
+        reply = mock_reply(prompt)
+        latency = self.options.latency()
+
+        if url.path.endswith(':streamGenerateContent'):
+            return self._stream(prompt, reply, latency, parse_qs(url.query).get('alt') == ['sse'])
+
+        time.sleep(latency)
+        self._send_json(200, {
+            "candidates": [{"content": {"parts": [{"text": reply}], "role": "model"}, "finishReason": "STOP"}],
+            "usageMetadata": usage_metadata(prompt, reply),
+            "modelVersion": "mock"
+        })
+
+    def _stream(self, prompt, reply, latency, sse):
+        # Time to first chunk is a third of the sampled latency; the rest is spread over the chunks
+        chunks = max(1, self.options.stream_chunks)
+        size = -(-len(reply) // chunks)
+        pieces = [reply[i:i + size] for i in range(0, len(reply), size)]
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream' if sse else 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        time.sleep(latency / 3)
+        for i, piece in enumerate(pieces):
+            event = {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}]}
+            if i == len(pieces) - 1:
+                event["usageMetadata"] = usage_metadata(prompt, reply)
+            data = f"data: {json.dumps(event)}\r\n\r\n".encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+            time.sleep(latency * 2 / 3 / len(pieces))
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Gemini generateContent API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', default='lognormal:1.0,0.4',
+                        help="fixed:S | uniform:A,B | normal:MEAN,SD | lognormal:MEDIAN,SIGMA | exp:MEAN")
+    parser.add_argument('--error-429', type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument('--error-5xx', type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument('--stream-chunks', type=int, default=8, help="chunks per streamed reply")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    args.latency = parse_latency(args.latency)
+    MockGeminiHandler.options = args
+
+    server = ThreadingHTTPServer((args.host, args.port), MockGeminiHandler)
+    server.daemon_threads = True
+    print(f"🧪 Mock Gemini listening on http://{args.host}:{args.port}/v1beta")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Benchmark the OCR pipeline: raw tesseract vs each pre-processing profile.
+
+    python ocr_benchmark.py                      # synthetic phone-style photos
+    python ocr_benchmark.py photo1.jpg photo2.png --profiles none educational code
+
+For every image and profile it reports pre-processing time, tesseract time
+and, for the synthetic images, accuracy against the known text.
+
+    python ocr_benchmark.py --engines            # test_integration.py images
+    python ocr_benchmark.py --engines --workers 4 --repeat 20
+
+compares the OCR backends instead: pytesseract (a tesseract process per
+image) against resident tesserocr engines, as per-image latency in this
+process and as throughput through a process pool like the app's.
+
+    python ocr_benchmark.py --tiling --workers 4
+
+times whole-image OCR against tiled parallel OCR through OCRService.
+"""
+
+import argparse
+import base64
+import difflib
+import io
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+import pytesseract
+from PIL import Image, ImageDraw, ImageFont
+from image_preprocess import preprocess, get_profile
+
+SAMPLE_TEXT = [
+    "Question 3. A binary search tree stores keys",
+    "so that every left child is smaller than its parent",
+    "and every right child is larger. Insert 50, 30, 70,",
+    "20, 40, 60 and 80 in order, then list the keys",
+    "visited by an in-order traversal. Explain why the",
+    "in-order traversal of any BST is always sorted."
+]
+
+
+def load_font(size):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size=size)
+        except TypeError:
+            return ImageFont.load_default()
+
+
+def synthetic_photo(angle=2.5, seed=0):
+    """Render SAMPLE_TEXT like a phone photo of a worksheet: 4000px, tilted, unevenly lit, noisy JPEG"""
+    page = Image.new('L', (1400, 900), 255)
+    draw = ImageDraw.Draw(page)
+    font = load_font(44)
+    for i, line in enumerate(SAMPLE_TEXT):
+        draw.text((60, 80 + i * 120), line, fill=20, font=font)
+    page = page.resize((4000, 2570), Image.BICUBIC).rotate(angle, expand=True, fillcolor=255, resample=Image.BICUBIC)
+
+    rng = np.random.default_rng(seed)
+    pixels = np.asarray(page, dtype=np.float32)
+    lighting = np.linspace(0.65, 1.0, pixels.shape[1])[None, :]
+    pixels = np.clip(pixels * lighting + rng.normal(0, 12, pixels.shape), 0, 255).astype(np.uint8)
+
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).convert('RGB').save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue(), " ".join(SAMPLE_TEXT)
+
+
+def accuracy(text, expected):
+    if expected is None:
+        return None
+    return difflib.SequenceMatcher(None, " ".join(text.split()), expected).ratio()
+
+
+def run_once(image_bytes, profile):
+    started = time.perf_counter()
+    image = preprocess(Image.open(io.BytesIO(image_bytes)), profile)
+    prepared = time.perf_counter()
+    text = pytesseract.image_to_string(image, config=get_profile(profile).get('tesseract_config', ''))
+    finished = time.perf_counter()
+    return prepared - started, finished - prepared, text
+
+
+def bundled_test_images():
+    """The images test_integration.py sends to the image routes, with their known text"""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from test_integration import make_test_image_base64
+    texts = ["Solve 2x + 3 = 11", "What is the time complexity of binary search?",
+             "Define a stack and a queue"]
+    return [(f"test-image-{i + 1}", base64.b64decode(make_test_image_base64(text).split(',')[-1]), text)
+            for i, text in enumerate(texts)]
+
+
+def engine_latency(engine, image):
+    """Seconds for one recognition of an already pre-processed image in this process"""
+    started = time.perf_counter()
+    if engine == 'tesserocr':
+        from ocr_service import _get_engine
+        api = _get_engine('eng', '')
+        api.SetImage(image)
+        text = api.GetUTF8Text()
+        api.Clear()
+    else:
+        text = pytesseract.image_to_string(image)
+    return time.perf_counter() - started, text
+
+
+def engine_throughput(engine, images, workers, repeat, profile):
+    """Images per second through a spawned pool running the app's worker function"""
+    # Spawned workers read OCR_ENGINE from the environment when they import config
+    os.environ['OCR_ENGINE'] = engine
+    from ocr_service import _run_ocr, _init_worker
+    context = multiprocessing.get_context('spawn')
+    recognize = partial(_run_ocr, lang='eng', tesseract_config='', timeout=60,
+                        tesseract_cmd=pytesseract.pytesseract.tesseract_cmd, profile=profile)
+    jobs = [image for _ in range(repeat) for image in images]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=('eng',)) as pool:
+        # Start every worker (and load its engine) before timing
+        list(pool.map(recognize, images[:1] * workers))
+        started = time.perf_counter()
+        list(pool.map(recognize, jobs))
+        return len(jobs) / (time.perf_counter() - started)
+
+
+def compare_engines(samples, workers, repeat, profile):
+    from ocr_service import TESSEROCR_AVAILABLE
+    engines = ['pytesseract'] + (['tesserocr'] if TESSEROCR_AVAILABLE else [])
+    if not TESSEROCR_AVAILABLE:
+        print("tesserocr is not installed; only pytesseract can be measured")
+
+    print(f"{'image':<16}{'engine':<13}{'first s':>9}{'median s':>10}{'accuracy':>10}")
+    for name, image_bytes, expected in samples:
+        image = preprocess(Image.open(io.BytesIO(image_bytes)), profile)
+        for engine in engines:
+            # The first call includes loading the language data for a fresh tesserocr engine
+            first, _ = engine_latency(engine, image)
+            runs = [engine_latency(engine, image) for _ in range(repeat)]
+            median = statistics.median(run[0] for run in runs)
+            score = accuracy(runs[-1][1], expected)
+            score_text = f"{score:.1%}" if score is not None else "-"
+            print(f"{name:<16}{engine:<13}{first:>9.3f}{median:>10.3f}{score_text:>10}")
+
+    print(f"\nThroughput with {workers} pool workers, {repeat} x {len(samples)} images:")
+    baseline = None
+    for engine in engines:
+        rate = engine_throughput(engine, [sample[1] for sample in samples], workers, repeat, profile)
+        baseline = baseline or rate
+        print(f"  {engine:<13}{rate:>8.1f} images/s  ({rate / baseline:.1f}x pytesseract)")
+
+
+def compare_tiling(samples, workers, repeat):
+    """Wall time per image through OCRService with tiling off and on"""
+    from config import Config
+    from ocr_service import OCRService
+    from response_cache import ResponseCache
+
+    print(f"{'image':<22}{'mode':<8}{'tiles':>6}{'median s':>10}{'accuracy':>10}")
+    for name, image_bytes, expected in samples:
+        baseline = None
+        for tiling in (False, True):
+            Config.OCR_TILING = tiling
+            times = []
+            for _ in range(repeat):
+                # A fresh service per run so the OCR cache never answers
+                service = OCRService(workers=workers, cache=ResponseCache(max_entries=1))
+                started = time.perf_counter()
+                text = service.image_to_text(image_bytes)
+                times.append(time.perf_counter() - started)
+                tiles = service.stats()['tiles'] or 1
+                service._pool.shutdown()
+            median = statistics.median(times)
+            baseline = baseline or median
+            score = accuracy(text, expected)
+            score_text = f"{score:.1%}" if score is not None else "-"
+            speedup = f"  ({baseline / median:.1f}x)" if tiling else ""
+            print(f"{name:<22}{'tiled' if tiling else 'whole':<8}{tiles if tiling else 1:>6}{median:>10.2f}{score_text:>10}{speedup}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR pre-processing profiles")
+    parser.add_argument('images', nargs='*', help="image files (default: synthetic photos)")
+    parser.add_argument('--profiles', nargs='+', default=['none', 'default', 'diagram', 'code'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--engines', action='store_true', help="compare pytesseract with resident tesserocr engines")
+    parser.add_argument('--tiling', action='store_true', help="compare whole-image OCR with tiled parallel OCR")
+    parser.add_argument('--workers', type=int, default=2, help="pool size for --engines and --tiling")
+    parser.add_argument('--profile', default='default', help="pre-processing profile for --engines")
+    args = parser.parse_args()
+
+    if args.images:
+        samples = []
+        for path in args.images:
+            with open(path, 'rb') as f:
+                samples.append((path, f.read(), None))
+    elif args.engines:
+        samples = bundled_test_images()
+    else:
+        samples = [(f"synthetic-{angle}deg", *synthetic_photo(angle, seed)) for seed, angle in enumerate((0.0, 2.5, -4.0))]
+
+    if args.engines:
+        compare_engines(samples, args.workers, args.repeat, args.profile)
+        return
+    if args.tiling:
+        compare_tiling(samples, args.workers, args.repeat)
+        return
+
+    print(f"{'image':<22}{'profile':<12}{'prep s':>8}{'ocr s':>8}{'total s':>9}{'accuracy':>10}")
+    for name, image_bytes, expected in samples:
+        baseline = None
+        for profile in args.profiles:
+            runs = [run_once(image_bytes, profile) for _ in range(args.repeat)]
+            prep = statistics.median(run[0] for run in runs)
+            ocr = statistics.median(run[1] for run in runs)
+            score = accuracy(runs[-1][2], expected)
+            if baseline is None:
+                baseline = prep + ocr
+            saved = f"  ({baseline - prep - ocr:+.2f}s saved vs {args.profiles[0]})" if profile != args.profiles[0] else ""
+            score_text = f"{score:.1%}" if score is not None else "-"
+            print(f"{name:<22}{profile:<12}{prep:>8.2f}{ocr:>8.2f}{prep + ocr:>9.2f}{score_text:>10}{saved}")
+
+
+if __name__ == "__main__":
+    main()
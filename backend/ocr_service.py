@@ -0,0 +1,474 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import shutil
+import threading
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from config import Config
+from response_cache import ResponseCache
+from single_flight import SingleFlight
+try:
+    import pytesseract
+    from PIL import Image
+    from image_preprocess import preprocess, get_profile, find_text_blocks, crop_blocks
+    PYTESSERACT_AVAILABLE = True
+except ImportError:
+    PYTESSERACT_AVAILABLE = False
+    print("Warning: pytesseract not available. OCR features will be disabled.")
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+
+class OCRError(Exception):
+    """Raised when text could not be extracted from an image"""
+
+
+class OCRUnavailableError(OCRError):
+    """Raised when pytesseract or the tesseract binary is missing"""
+
+
+class OCRTimeoutError(OCRError):
+    """Raised when an OCR job runs past its timeout"""
+
+
+class OCRBusyError(OCRError):
+    """Raised without queueing when the OCR queue is full"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Resident tesserocr engines of this pool process, keyed by (lang, tesseract_config)
+_engines = {}
+_engine_failed = False
+
+
+def _parse_tesseract_config(tesseract_config):
+    """Split a pytesseract-style config string into (psm, oem, variables)"""
+    psm, oem, variables = None, None, {}
+    args = (tesseract_config or '').split()
+    i = 0
+    while i < len(args):
+        if args[i] == '--psm' and i + 1 < len(args):
+            psm, i = int(args[i + 1]), i + 1
+        elif args[i] == '--oem' and i + 1 < len(args):
+            oem, i = int(args[i + 1]), i + 1
+        elif args[i] == '-c' and i + 1 < len(args) and '=' in args[i + 1]:
+            name, value = args[i + 1].split('=', 1)
+            variables[name] = value
+            i += 1
+        i += 1
+    return psm, oem, variables
+
+
+def _get_engine(lang, tesseract_config):
+    """Return this process's initialised engine for lang and config, creating it once"""
+    key = (lang, tesseract_config or '')
+    engine = _engines.get(key)
+    if engine is None:
+        psm, oem, variables = _parse_tesseract_config(tesseract_config)
+        options = {'lang': lang}
+        if Config.OCR_TESSDATA_PATH:
+            options['path'] = Config.OCR_TESSDATA_PATH
+        if oem is not None:
+            options['oem'] = oem
+        if psm is not None:
+            options['psm'] = psm
+        engine = tesserocr.PyTessBaseAPI(**options)
+        for name, value in variables.items():
+            engine.SetVariable(name, value)
+        _engines[key] = engine
+    return engine
+
+
+def _use_resident_engine():
+    return TESSEROCR_AVAILABLE and not _engine_failed and Config.OCR_ENGINE in ('auto', 'tesserocr')
+
+
+def _init_worker(lang):
+    """Pool initializer: load the language data once, before the first image arrives"""
+    global _engine_failed
+    if not _use_resident_engine():
+        return
+    try:
+        _get_engine(lang, '')
+    except Exception as e:
+        # Missing tessdata or a broken build: this process uses pytesseract instead
+        _engine_failed = True
+        print(f"tesserocr unavailable in OCR worker, using pytesseract: {e}")
+
+
+def _run_ocr(image_bytes, lang, tesseract_config, timeout, tesseract_cmd, profile):
+    """Runs in a pool process: decode, pre-process and OCR the image with a hard timeout.
+
+    Uses the process's resident tesserocr engine when there is one, so the
+    language data is loaded once per worker rather than once per image;
+    otherwise pytesseract runs the tesseract binary for the image.
+    """
+    global _engine_failed
+    image = preprocess(Image.open(io.BytesIO(image_bytes)), profile)
+    tesseract_config = tesseract_config or get_profile(profile).get('tesseract_config', '')
+
+    if _use_resident_engine():
+        try:
+            engine = _get_engine(lang, tesseract_config)
+        except Exception as e:
+            _engine_failed = True
+            print(f"tesserocr unavailable in OCR worker, using pytesseract: {e}")
+        else:
+            engine.SetImage(image)
+            # Recognize returns False when the timeout (ms) cancels it
+            recognized = engine.Recognize(int(timeout * 1000))
+            text = engine.GetUTF8Text() if recognized else None
+            engine.Clear()
+            if text is None:
+                raise TimeoutError('Tesseract recognition timeout')
+            return text
+
+    # Spawned workers don't inherit the binary path the app resolved at startup
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    try:
+        return pytesseract.image_to_string(image, lang=lang, config=tesseract_config, timeout=timeout)
+    except RuntimeError as e:
+        # pytesseract kills tesseract and raises RuntimeError('Tesseract process timeout')
+        if 'timeout' in str(e).lower():
+            raise TimeoutError(str(e))
+        raise
+
+
+def _layout_tiles(image_bytes, profile, max_tiles):
+    """Runs in a pool process: pre-process the image once and cut it into text blocks.
+
+    Returns the blocks as PNG bytes in reading order, already pre-processed;
+    a page that is a single block comes back whole, so it isn't
+    pre-processed again.
+    """
+    image = preprocess(Image.open(io.BytesIO(image_bytes)), profile)
+    blocks = find_text_blocks(image, max_blocks=max_tiles)
+    tiles = []
+    for tile in (crop_blocks(image, blocks) if len(blocks) > 1 else [image]):
+        buffer = io.BytesIO()
+        tile.save(buffer, format='PNG')
+        tiles.append(buffer.getvalue())
+    return tiles
+
+
+class OCRCapabilities:
+    """What OCR this process can do, probed once on first use and then cached.
+
+    Finding tesseract means running `tesseract --version` for candidate
+    paths, so it stays off the import path: workers boot without forking,
+    and the first OCR call or /check-ocr request pays for it once.
+    """
+
+    CANDIDATE_PATHS = [
+        r'C:\Program Files\Tesseract-OCR\tesseract.exe',
+        r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
+        'tesseract'  # If it's in PATH
+    ]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._capabilities = None
+
+    def get(self) -> dict:
+        """Return the cached capabilities, probing on the first call"""
+        if self._capabilities is None:
+            with self._lock:
+                if self._capabilities is None:
+                    self._capabilities = self._probe()
+        return self._capabilities
+
+    def _probe(self):
+        capabilities = {
+            'available': False,
+            'pytesseract': PYTESSERACT_AVAILABLE,
+            'tesserocr': TESSEROCR_AVAILABLE,
+            'engine': None,
+            'tesseract_cmd': None,
+            'tesseract_version': None,
+            'error': None
+        }
+        if not PYTESSERACT_AVAILABLE:
+            capabilities['error'] = 'pytesseract library not installed'
+            return capabilities
+
+        candidates = ([Config.TESSERACT_CMD] if Config.TESSERACT_CMD else []) + self.CANDIDATE_PATHS
+        for path in candidates:
+            # Only paths that exist get a version check, so at most one process per real binary
+            if not shutil.which(path):
+                continue
+            try:
+                pytesseract.pytesseract.tesseract_cmd = path
+                capabilities['tesseract_version'] = str(pytesseract.get_tesseract_version())
+                capabilities['tesseract_cmd'] = path
+                print(f"✅ Tesseract found at: {path}")
+                break
+            except Exception as e:
+                print(f"⚠️ Tesseract at {path} failed: {e}")
+
+        if capabilities['tesseract_cmd']:
+            capabilities['available'] = True
+            capabilities['engine'] = 'tesserocr' if TESSEROCR_AVAILABLE and Config.OCR_ENGINE != 'pytesseract' else 'pytesseract'
+        elif TESSEROCR_AVAILABLE and Config.OCR_ENGINE != 'pytesseract':
+            # libtesseract without the command-line binary still reads images
+            capabilities['available'] = True
+            capabilities['engine'] = 'tesserocr'
+            capabilities['tesseract_version'] = tesserocr.tesseract_version().split()[1]
+        else:
+            capabilities['error'] = 'Tesseract OCR not found. Install it and add it to PATH, or set TESSERACT_CMD.'
+            print("❌ Tesseract OCR not found. OCR features will be disabled.")
+        return capabilities
+
+
+ocr_capabilities = OCRCapabilities()
+
+
+class OCRService:
+    """One fixed-size process pool for every OCR call in the app.
+
+    Tesseract is CPU bound, so at most `workers` images are recognised at
+    once per gunicorn worker, in separate processes, and the request threads
+    only wait. At most `max_queue` jobs may be queued or running; beyond that
+    callers get OCRBusyError straight away (routes answer 503 with
+    Retry-After) instead of piling up behind a burst of uploads. Each job is
+    bounded by `timeout` seconds, enforced by killing its tesseract process.
+
+    With tesserocr installed each pool process keeps initialised Tesseract
+    engines resident (OCR_ENGINE=auto|tesserocr|pytesseract); pytesseract,
+    which starts a tesseract process per image, is the fallback.
+
+    Images of at least OCR_TILE_MIN_PIXELS are cut into text blocks (a
+    projection-profile XY-cut) that are recognised in parallel and stitched
+    back in reading order, so one large scan uses every worker, not one.
+
+    Results are cached by a hash of the image bytes, so the same worksheet
+    sent to several routes is only recognised once.
+    """
+
+    def __init__(self, workers: int = None, max_queue: int = None, timeout: float = None,
+                 cache: ResponseCache = None):
+        self.workers = workers or Config.OCR_WORKERS
+        self.max_queue = max_queue or Config.OCR_QUEUE_SIZE
+        self.timeout = timeout or Config.OCR_TIMEOUT
+        self.cache = cache or ResponseCache(max_entries=Config.OCR_CACHE_SIZE, ttl=Config.OCR_CACHE_TTL,
+                                            db_path=Config.OCR_CACHE_DB or None, table='ocr_results')
+        self._flight = SingleFlight()
+
+        self._pool = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._latencies = deque(maxlen=200)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.tiled = 0
+        self.tiles = 0
+
+    def _get_pool(self):
+        """Start the pool on first use so importing the app never forks (lock held)"""
+        if self._pool is None:
+            # spawn: forking a multi-threaded gunicorn worker can deadlock the child
+            context = multiprocessing.get_context(Config.OCR_START_METHOD)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                             initializer=_init_worker, initargs=(Config.OCR_LANG,))
+        return self._pool
+
+    def _reserve(self):
+        with self._lock:
+            if self._in_flight >= self.max_queue:
+                self.rejected += 1
+                # Roughly the time for the queue ahead to drain
+                retry_after = max(1, int(self._queue_drain_estimate()))
+                raise OCRBusyError("The image reader is busy. Please try again shortly.", retry_after)
+            self._in_flight += 1
+            self.submitted += 1
+            return self._get_pool()
+
+    def _release(self, started, outcome):
+        with self._lock:
+            self._in_flight -= 1
+            if outcome == 'ok':
+                self.completed += 1
+                self._latencies.append(time.monotonic() - started)
+            elif outcome == 'timeout':
+                self.timeouts += 1
+            else:
+                self.failed += 1
+
+    def _queue_drain_estimate(self):
+        """Seconds until a queued job would start, from recent job latency (lock held)"""
+        average = sum(self._latencies) / len(self._latencies) if self._latencies else 2.0
+        return average * self._in_flight / self.workers
+
+    def image_to_text(self, image_bytes: bytes, lang: str = None, tesseract_config: str = '',
+                      profile: str = 'default', tile: bool = True) -> str:
+        """OCR an encoded image (PNG, JPEG, ...) and return its text.
+
+        profile names the pre-processing pipeline in image_preprocess.PROFILES
+        (an analyze_image analysis_type, or 'none' to OCR the image as is).
+        tile=False keeps a large image in one piece.
+        Raises OCRUnavailableError, OCRBusyError, OCRTimeoutError or OCRError.
+        """
+        if not PYTESSERACT_AVAILABLE:
+            raise OCRUnavailableError("OCR library not available")
+
+        lang = lang or Config.OCR_LANG
+        # Key on what the profile resolves to, so aliases and unknown names share entries
+        settings = f"{lang}\0{tesseract_config}\0{json.dumps(get_profile(profile), sort_keys=True)}"
+        content_key = hashlib.sha256(image_bytes + b"\0" + settings.encode('utf-8')).hexdigest()
+        text = self.cache.get(content_key)
+        if text is not None:
+            return text
+
+        # The same image arriving on several routes at once is recognised once
+        text = self._flight.do(content_key, lambda: self._recognize(image_bytes, lang, tesseract_config, profile, tile))
+        self.cache.set(content_key, text)
+        return text
+
+    def iter_images_to_text(self, images, lang: str = None, tesseract_config: str = '',
+                            profile: str = 'default'):
+        """OCR several images in parallel, yielding (index, text, error) as each one finishes.
+
+        At most `workers` pages of one batch are in the pool at a time, each
+        holding one queue slot, so a 30-page PDF neither trips the queue
+        limit nor starves other users. images may be any iterable; the next
+        page is only taken from it when a worker frees up, so pages rendered
+        lazily from a PDF are produced while earlier ones are being read.
+        Pages are not tiled: the batch already keeps every worker busy, and
+        tiles would queue ahead of other users' jobs. error is an OCRError
+        for a page that failed and None otherwise.
+        """
+        images = iter(images)
+        fan_out = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ocr-batch')
+        pending = {}
+        index = 0
+        try:
+            while True:
+                for image in islice(images, self.workers - len(pending)):
+                    pending[fan_out.submit(self.image_to_text, image, lang, tesseract_config, profile, tile=False)] = index
+                    index += 1
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page = pending.pop(future)
+                    try:
+                        yield page, future.result(), None
+                    except OCRError as e:
+                        yield page, None, e
+        finally:
+            # The client went away: drop pages that haven't started
+            fan_out.shutdown(wait=False, cancel_futures=True)
+
+    def _should_tile(self, image_bytes, profile):
+        """Large images are split into text blocks recognised in parallel (header read only)"""
+        if not Config.OCR_TILING or self.workers < 2 or profile == 'none':
+            return False
+        try:
+            width, height = Image.open(io.BytesIO(image_bytes)).size
+        except Exception:
+            return False
+        return width * height >= Config.OCR_TILE_MIN_PIXELS
+
+    def _recognize(self, image_bytes, lang, tesseract_config, profile, tile=True):
+        """OCR one image on the pool under a single queue slot.
+
+        A large image is split into tiles, and all of its tiles run under
+        that one slot, so tiling never takes queue room from other callers.
+        """
+        capabilities = ocr_capabilities.get()
+        if not capabilities['available']:
+            raise OCRUnavailableError(capabilities['error'])
+        pool = self._reserve()
+        started = time.monotonic()
+        outcome = 'error'
+        try:
+            if tile and self._should_tile(image_bytes, profile):
+                tiles = self._result(pool.submit(_layout_tiles, image_bytes, profile,
+                                                 self.workers * Config.OCR_TILES_PER_WORKER))
+                text = self._recognize_tiles(pool, tiles, lang,
+                                             tesseract_config or get_profile(profile).get('tesseract_config', ''))
+            else:
+                text = self._result(pool.submit(_run_ocr, image_bytes, lang, tesseract_config, self.timeout,
+                                                self._tesseract_cmd(), profile))
+            outcome = 'ok'
+            return text
+        except (TimeoutError, FutureTimeoutError):
+            outcome = 'timeout'
+            raise OCRTimeoutError("Reading the image took too long. Please try a smaller or clearer image.")
+        except BrokenProcessPool:
+            with self._lock:
+                self._pool = None
+            raise OCRError("The image reader crashed. Please try again.")
+        except pytesseract.TesseractNotFoundError as e:
+            raise OCRUnavailableError(str(e))
+        except OCRError:
+            raise
+        except Exception as e:
+            raise OCRError(str(e))
+        finally:
+            self._release(started, outcome)
+
+    def _result(self, future):
+        """Wait for one pool job, leaving room for queueing behind a full pool on top of its own timeout"""
+        try:
+            return future.result(timeout=self.timeout * 2 + 1)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def _recognize_tiles(self, pool, tiles, lang, tesseract_config):
+        """OCR pre-processed tiles across the pool and stitch the text back in reading order"""
+        if len(tiles) > 1:
+            with self._lock:
+                self.tiled += 1
+                self.tiles += len(tiles)
+        futures = [pool.submit(_run_ocr, tile, lang, tesseract_config, self.timeout, self._tesseract_cmd(), 'none')
+                   for tile in tiles]
+        try:
+            texts = [self._result(future) for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        return "\n\n".join(text.strip() for text in texts if text.strip())
+
+    def _tesseract_cmd(self):
+        """The binary found by the capability probe, handed to spawned workers"""
+        return ocr_capabilities.get()['tesseract_cmd'] or pytesseract.pytesseract.tesseract_cmd
+
+    def stats(self) -> dict:
+        """Return pool and job counters for the metrics endpoint"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'workers': self.workers,
+                'engine': 'tesserocr' if TESSEROCR_AVAILABLE and Config.OCR_ENGINE != 'pytesseract' else 'pytesseract',
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'timeouts': self.timeouts,
+                'rejected': self.rejected,
+                'tiled': self.tiled,
+                'tiles': self.tiles,
+                'p50_latency': round(latencies[len(latencies) // 2], 3) if latencies else None,
+                'p95_latency': round(latencies[int(len(latencies) * 0.95)], 3) if latencies else None,
+                'cache': self.cache.stats()
+            }
+
+
+ocr_service = OCRService()
@@ -0,0 +1,158 @@
+import json
+
+# Gemini responseSchema (OpenAPI subset) for one multiple-choice question
+QUESTION_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "question": {"type": "STRING"},
+        "options": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "correct_answer": {"type": "INTEGER"},
+        "explanation": {"type": "STRING"}
+    },
+    "required": ["question", "options", "correct_answer", "explanation"],
+    "propertyOrdering": ["question", "options", "correct_answer", "explanation"]
+}
+
+QUIZ_SCHEMA = {"type": "ARRAY", "items": QUESTION_SCHEMA}
+
+
+def quiz_generation_config(schema=None) -> dict:
+    """generationConfig asking Gemini for JSON that matches schema (a question array by default)"""
+    return {
+        "responseMimeType": "application/json",
+        "responseSchema": schema or QUIZ_SCHEMA
+    }
+
+
+def batch_quiz_schema(subjects) -> dict:
+    """Schema for a batch reply: one question array per subject name"""
+    return {
+        "type": "OBJECT",
+        "properties": {subject: QUIZ_SCHEMA for subject in subjects},
+        "required": list(subjects)
+    }
+
+
+def parse_batch_subjects(entries, default_count: int = 5, max_count: int = 20):
+    """Validate the subjects list of a batch quiz request into (subject, count) pairs.
+
+    Each entry is a subject name or {"subject": name, "count": n}; counts are
+    clamped to [1, max_count]. Raises ValueError describing the first bad entry.
+    """
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("subjects must be a non-empty list")
+    parsed = []
+    for position, entry in enumerate(entries):
+        if isinstance(entry, dict):
+            subject = entry.get('subject')
+            count = entry.get('count', default_count)
+        else:
+            subject, count = entry, default_count
+        if not isinstance(subject, str) or not subject.strip():
+            raise ValueError(f"subjects[{position}] must be a subject name or an object with a non-empty \"subject\"")
+        if not isinstance(count, int) or isinstance(count, bool):
+            raise ValueError(f"subjects[{position}].count must be an integer")
+        parsed.append((subject, max(1, min(count, max_count))))
+    return parsed
+
+
+def is_valid_question(question) -> bool:
+    """Check that a parsed question has the fields the quiz UI needs"""
+    if not isinstance(question, dict):
+        return False
+    options = question.get('options')
+    answer = question.get('correct_answer')
+    if not question.get('question') or not isinstance(options, list) or len(options) < 2:
+        return False
+    return isinstance(answer, int) and not isinstance(answer, bool) and 0 <= answer < len(options)
+
+
+class QuizArrayParser:
+    """Incremental parser for a JSON array of quiz questions.
+
+    feed() takes text as it streams in and returns every question object
+    that has been closed since the last call, so a client can show question
+    one while the rest are still generating. It only tracks string and
+    nesting state, never re-scanning text it has already seen, and it
+    tolerates prose before the array and a truncated tail. Objects that
+    don't decode or fail validation are counted in `skipped` and dropped.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self._object = None
+        self.questions = []
+        self.skipped = 0
+
+    def feed(self, text: str):
+        """Consume a chunk of the reply and return the questions it completed"""
+        completed = []
+        for char in text:
+            if self._object is not None:
+                self._object.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = self._started
+            elif char == '[':
+                if not self._started:
+                    self._started = True
+                self._depth += 1
+            elif char == '{' and self._started:
+                self._depth += 1
+                if self._depth == 2:
+                    self._object = ['{']
+            elif char in ']}' and self._started:
+                self._depth -= 1
+                if char == '}' and self._depth == 1 and self._object is not None:
+                    question = self._decode("".join(self._object))
+                    self._object = None
+                    if question is not None:
+                        completed.append(question)
+        self.questions.extend(completed)
+        return completed
+
+    def _decode(self, raw):
+        try:
+            question = json.loads(raw)
+        except ValueError:
+            self.skipped += 1
+            return None
+        if not is_valid_question(question):
+            self.skipped += 1
+            return None
+        return question
+
+
+def salvage_questions(reply: str):
+    """Return every complete, valid question in reply, even if the array as a whole is broken"""
+    parser = QuizArrayParser()
+    parser.feed(reply)
+    return parser.questions
+
+
+def parse_quiz_reply(reply: str):
+    """Parse a quiz reply into valid questions.
+
+    Returns (questions, salvaged): salvaged is True when the reply was not a
+    clean array and questions were recovered from it piece by piece.
+    """
+    try:
+        data = json.loads(reply)
+    except ValueError:
+        data = None
+    if isinstance(data, list) and data and all(is_valid_question(question) for question in data):
+        return data, False
+    return salvage_questions(reply), True
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import queue
+import threading
+from collections import deque
+from config import Config
+
+
+class QuizPool:
+    """Per-subject pool of pre-generated quizzes kept full by a background worker.
+
+    Each subject's pool is tagged with a hash of its topic list, so quizzes
+    generated for an old topic list are never served after the course data
+    changes. Requests pop a ready quiz in O(1) and the worker tops the pool
+    back up off the request path.
+
+    A subject whose refill fails, or that has to wait because should_defer()
+    says foreground traffic needs the upstream budget, goes back on the
+    queue after retry_delay on a timer, so it never holds up the others.
+    """
+
+    def __init__(self, generator, topics_loader, target_size: int = None, retry_delay: float = None,
+                 should_defer=None, max_retries: int = None):
+        """
+        generator: callable(subject, topics) -> list of question dicts
+        topics_loader: callable(subject) -> current list of topic titles
+        should_defer: optional callable() -> True when a refill should wait
+        """
+        self.generator = generator
+        self.topics_loader = topics_loader
+        self.target_size = target_size or Config.QUIZ_POOL_SIZE
+        self.retry_delay = retry_delay or Config.QUIZ_POOL_RETRY_DELAY
+        self.should_defer = should_defer
+        self.max_retries = Config.QUIZ_POOL_MAX_RETRIES if max_retries is None else max_retries
+        self._retries = {}
+
+        self._pools = {}
+        self._queued = set()
+        self._refills = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.failures = 0
+        self.invalidations = 0
+        self.deferred = 0
+
+    @staticmethod
+    def topics_key(topics) -> str:
+        """Hash a subject's topic list"""
+        return hashlib.sha256(json.dumps(list(topics)).encode('utf-8')).hexdigest()
+
+    def get(self, subject: str, topics):
+        """Pop a ready quiz for subject, or return None if the pool is empty.
+
+        Either way the subject is scheduled for a refill.
+        """
+        key = self.topics_key(topics)
+        with self._lock:
+            pool = self._pools.get(subject)
+            if pool is None or pool['key'] != key:
+                pool = {'key': key, 'quizzes': deque()}
+                self._pools[subject] = pool
+            quiz = pool['quizzes'].popleft() if pool['quizzes'] else None
+            if quiz is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        self.schedule_refill(subject)
+        return quiz
+
+    def warm(self, subjects):
+        """Start filling the pools for the given subjects"""
+        for subject in subjects:
+            self.schedule_refill(subject)
+
+    def invalidate(self, subject: str):
+        """Drop every pooled quiz for subject and regenerate if the subject was in use"""
+        with self._lock:
+            was_active = self._pools.pop(subject, None) is not None
+            self.invalidations += 1
+        if was_active:
+            self.schedule_refill(subject)
+
+    def schedule_refill(self, subject: str):
+        """Queue subject for the background worker unless it is already queued"""
+        with self._lock:
+            if subject in self._queued:
+                return
+            self._queued.add(subject)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='quiz-pool-worker', daemon=True)
+                self._worker.start()
+        self._refills.put(subject)
+
+    def _run(self):
+        while True:
+            subject = self._refills.get()
+            try:
+                done = self._refill(subject)
+            except Exception as e:
+                print(f"Quiz pool refill for {subject} failed: {e}")
+                with self._lock:
+                    self.failures += 1
+                    retries = self._retries.get(subject, 0) + 1
+                    self._retries[subject] = retries
+                # Give up after max_retries; the next get() schedules it again
+                done = retries > self.max_retries
+            if done:
+                with self._lock:
+                    self._queued.discard(subject)
+                    self._retries.pop(subject, None)
+            else:
+                self._requeue_later(subject)
+
+    def _requeue_later(self, subject):
+        """Put subject back on the queue after retry_delay without holding up the worker"""
+        timer = threading.Timer(self.retry_delay, self._refills.put, args=(subject,))
+        timer.daemon = True
+        timer.start()
+
+    def _refill(self, subject):
+        """Top up subject's pool; False if it was deferred and should be retried later"""
+        topics = self.topics_loader(subject)
+        if not topics:
+            return True
+        key = self.topics_key(topics)
+        while True:
+            with self._lock:
+                pool = self._pools.setdefault(subject, {'key': key, 'quizzes': deque()})
+                if pool['key'] != key or len(pool['quizzes']) >= self.target_size:
+                    return True
+
+            # Interactive requests come first when the upstream budget runs low
+            if self.should_defer is not None and self.should_defer():
+                with self._lock:
+                    self.deferred += 1
+                return False
+
+            questions = self.generator(subject, topics)
+
+            with self._lock:
+                pool = self._pools.get(subject)
+                # Topics changed while we were generating; the result is stale
+                if pool is None or pool['key'] != key:
+                    return True
+                pool['quizzes'].append(questions)
+                self.generated += 1
+
+    def stats(self) -> dict:
+        """Return pool sizes and hit/miss counters for the metrics endpoint"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'generated': self.generated,
+                'failures': self.failures,
+                'invalidations': self.invalidations,
+                'deferred': self.deferred,
+                'target_size': self.target_size,
+                'pending_refills': len(self._queued),
+                'pools': {subject: len(pool['quizzes']) for subject, pool in self._pools.items()}
+            }
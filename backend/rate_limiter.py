@@ -0,0 +1,186 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import request, jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from config import Config
+
+
+class TokenBucketLimiter:
+    """Token-bucket rate limiter whose buckets live in a SQLite file.
+
+    Every gunicorn worker on the host opens the same file, so a user's budget
+    is enforced once per host instead of once per worker. Each check is a
+    single-row read-modify-write inside an IMMEDIATE transaction, O(1)
+    regardless of traffic.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or Config.RATE_LIMIT_DB
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._checks = 0
+        self.allowed = 0
+        self.rejected = 0
+        self.init_database()
+
+    def get_connection(self):
+        """Get this thread's connection to the shared bucket store"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def init_database(self):
+        """Create the buckets table if it doesn't exist"""
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.get_connection().execute('''
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                bucket TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+
+    def consume(self, bucket: str, capacity: float, refill_per_second: float, cost: float = 1):
+        """Take cost tokens from bucket.
+
+        Returns (allowed, retry_after_seconds).
+        """
+        now = time.time()
+        conn = self.get_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket = ?', (bucket,)
+            ).fetchone()
+            if row is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, row[0] + (now - row[1]) * refill_per_second)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limit_buckets (bucket, tokens, updated_at) VALUES (?, ?, ?)',
+                (bucket, tokens, now)
+            )
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            # Never take the routes down because the limiter store is unavailable
+            print(f"Rate limiter error: {e}")
+            try:
+                conn.execute('ROLLBACK')
+            except sqlite3.Error:
+                pass
+            return True, 0
+
+        self._record(allowed)
+        if allowed:
+            return True, 0
+        return False, math.ceil((cost - tokens) / refill_per_second)
+
+    def available(self, bucket: str, capacity: float, refill_per_second: float) -> float:
+        """Tokens currently left in bucket, without taking any"""
+        try:
+            row = self.get_connection().execute(
+                'SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket = ?', (bucket,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Rate limiter error: {e}")
+            return capacity
+        if row is None:
+            return capacity
+        return min(capacity, row[0] + (time.time() - row[1]) * refill_per_second)
+
+    def _record(self, allowed):
+        with self._lock:
+            if allowed:
+                self.allowed += 1
+            else:
+                self.rejected += 1
+            self._checks += 1
+            prune = self._checks % 1000 == 0
+        if prune:
+            # Buckets idle for a day are full again; dropping them is equivalent
+            try:
+                self.get_connection().execute(
+                    'DELETE FROM rate_limit_buckets WHERE updated_at < ?', (time.time() - 86400,)
+                )
+            except sqlite3.Error as e:
+                print(f"Rate limiter prune error: {e}")
+
+    def stats(self) -> dict:
+        """Return allow/reject counters for the metrics endpoint"""
+        with self._lock:
+            return {
+                'allowed': self.allowed,
+                'rejected': self.rejected
+            }
+
+
+rate_limiter = TokenBucketLimiter()
+
+
+def get_client_identity():
+    """Identify the caller by JWT identity when a valid token is sent, otherwise by IP"""
+    try:
+        verify_jwt_in_request(optional=True)
+        user = get_jwt_identity()
+    except Exception:
+        user = None
+    if isinstance(user, dict):
+        user = user.get('username')
+    if user:
+        return f"user:{user}"
+    return f"ip:{client_ip()}"
+
+
+def client_ip():
+    """The caller's IP, trusting X-Forwarded-For only as far as our own proxies.
+
+    Each of the TRUSTED_PROXY_HOPS proxies in front of the app appends the
+    address it saw, so the entry that many places from the right is the
+    real client; anything further left is whatever the client sent.
+    """
+    hops = Config.TRUSTED_PROXY_HOPS
+    if hops > 0 and request.headers.get('X-Forwarded-For'):
+        route = request.access_route
+        if len(route) >= hops:
+            return route[-hops]
+    return request.remote_addr or 'unknown'
+
+
+def rate_limited(route: str, capacity: int = None, window: float = None):
+    """Decorator applying a per-user, per-route token bucket to a Flask view.
+
+    capacity requests are allowed per window seconds, refilled continuously.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            bucket_capacity = capacity or Config.USER_RATE_LIMIT_CAPACITY
+            bucket_window = window or Config.USER_RATE_LIMIT_WINDOW
+            bucket = f"{route}:{get_client_identity()}"
+            allowed, retry_after = rate_limiter.consume(bucket, bucket_capacity, bucket_capacity / bucket_window)
+            if not allowed:
+                message = "Rate limit exceeded. Please try again later."
+                response = jsonify({
+                    "error": message,
+                    "reply": message,
+                    "retry_after": retry_after
+                })
+                response.headers['Retry-After'] = str(retry_after)
+                return response, 429
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+
+class ResponseCache:
+    """Content-addressed LRU cache with a TTL.
+
+    Entries live in an in-process OrderedDict. When db_path is set, they are
+    also written to a SQLite file so every gunicorn worker on the host shares
+    one set of cached answers.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None, db_path: str = None,
+                 max_disk_entries: int = None, table: str = 'responses'):
+        self.max_entries = max_entries or Config.RESPONSE_CACHE_SIZE
+        self.ttl = ttl or Config.RESPONSE_CACHE_TTL
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries or Config.RESPONSE_CACHE_DISK_SIZE
+        self.table = table
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+        if self.db_path:
+            self.init_database()
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Drop trailing spaces and surrounding blank lines so near-identical prompts share one key.
+
+        Case and indentation are kept: they change the meaning of pasted code,
+        identifiers and OCR'd questions.
+        """
+        lines = prompt.replace('\r\n', '\n').split('\n')
+        return '\n'.join(re.sub(r'[ \t]+$', '', line) for line in lines).strip()
+
+    @classmethod
+    def make_key(cls, prompt: str, model: str) -> str:
+        """Build the cache key for a final prompt sent to a given model"""
+        normalized = cls.normalize_prompt(prompt)
+        return hashlib.sha256(f"{model}\0{normalized}".encode('utf-8')).hexdigest()
+
+    def get_connection(self):
+        """Get a connection to the shared on-disk tier"""
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def init_database(self):
+        """Create the on-disk cache table if it doesn't exist"""
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        conn = self.get_connection()
+        try:
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            ''')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{self.table}_accessed_at ON {self.table}(accessed_at)')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get(self, key: str):
+        """Return the cached value for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            # Expired entries stay until LRU eviction so get_stale() can still serve them
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        if self.db_path:
+            value, expires_at = self._disk_get(key, now)
+            if value is not None:
+                with self._lock:
+                    self._store(key, value, expires_at)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def get_stale(self, key: str):
+        """Return a cached value even if its TTL has passed; used as a fallback when Gemini is down"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.stale_hits += 1
+                return entry[0]
+        if self.db_path:
+            value, _ = self._disk_get(key, None)
+            if value is not None:
+                with self._lock:
+                    self.stale_hits += 1
+                return value
+        return None
+
+    def set(self, key: str, value):
+        """Cache a JSON-serializable value under key"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+            self._writes += 1
+            prune = self._writes % 100 == 0
+        if self.db_path:
+            self._disk_set(key, value, expires_at, prune)
+
+    def _store(self, key, value, expires_at):
+        """Insert into the in-process tier, evicting the least recently used entry (lock held)"""
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, key, now):
+        try:
+            conn = self.get_connection()
+            try:
+                row = conn.execute(
+                    f'SELECT value, expires_at FROM {self.table} WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None:
+                    return None, None
+                # now=None reads past the TTL; expired rows are removed by the periodic prune
+                if now is not None and row[1] <= now:
+                    return None, None
+                conn.execute(f'UPDATE {self.table} SET accessed_at = ? WHERE key = ?', (time.time(), key))
+                conn.commit()
+                return json.loads(row[0]), row[1]
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Response cache read error: {e}")
+            return None, None
+
+    def _disk_set(self, key, value, expires_at, prune):
+        try:
+            conn = self.get_connection()
+            try:
+                now = time.time()
+                conn.execute(
+                    f'INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                    (key, json.dumps(value), expires_at, now)
+                )
+                if prune:
+                    # Drop rows expired for over a day, then the least recently used ones beyond the disk cap
+                    conn.execute(f'DELETE FROM {self.table} WHERE expires_at <= ?', (now - 86400,))
+                    conn.execute(f'''
+                        DELETE FROM {self.table} WHERE key IN (
+                            SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                        )
+                    ''', (self.max_disk_entries,))
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Response cache write error: {e}")
+
+    def clear(self):
+        """Drop every cached entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            conn = self.get_connection()
+            try:
+                conn.execute(f'DELETE FROM {self.table}')
+                conn.commit()
+            finally:
+                conn.close()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for the metrics endpoint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'disk_tier': bool(self.db_path)
+            }
+
+
+response_cache = ResponseCache(db_path=Config.RESPONSE_CACHE_DB or None)
@@ -0,0 +1,72 @@
+import threading
+
+
+class _Call:
+    """One in-flight upstream call and the result its waiters will share"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one upstream call.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is still running block until it finishes and receive the same result
+    (or the same exception).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.merged = 0
+
+    def do(self, key: str, fn):
+        """Run fn() once for every concurrent caller with this key"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.merged += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self) -> dict:
+        """Return coalescing counters for the metrics endpoint"""
+        with self._lock:
+            return {
+                'upstream_calls': self.leaders,
+                'merged_requests': self.merged,
+                'in_flight': len(self._calls),
+                'waiting': sum(call.waiters for call in self._calls.values())
+            }
+
+
+llm_single_flight = SingleFlight()
@@ -0,0 +1,34 @@
+"""
+Tests for folding old /chat turns into the conversation summary
+"""
+
+import os
+os.environ.setdefault('GEMINI_API_KEY', 'test-key')
+
+from conversation_memory import ConversationMemory
+
+
+def test_fold_keeps_the_newer_half_verbatim():
+    memory = ConversationMemory(lambda prompt: "summary", max_turns=12, token_budget=100)
+    message = "word " * 20
+
+    # Each turn is about 27 tokens, so the fourth one takes the session over budget
+    for i in range(4):
+        memory.record("user:a", f"{i} {message}", f"reply {i}")
+    memory._summarizer.shutdown(wait=True)
+
+    session = memory._sessions["user:a"]
+    assert [user.split()[0] for user, _ in session.turns] == ["2", "3"]
+    assert session.summary == "summary"
+
+
+def test_fold_of_a_long_buffer_keeps_half_of_it():
+    memory = ConversationMemory(lambda prompt: "summary", max_turns=12, token_budget=10_000)
+    for i in range(8):
+        memory.record("user:a", f"{i} question", f"reply {i}")
+    memory.token_budget = 10
+    memory.record("user:a", "8 question", "reply 8")
+    memory._summarizer.shutdown(wait=True)
+
+    session = memory._sessions["user:a"]
+    assert [user.split()[0] for user, _ in session.turns] == ["5", "6", "7", "8"]
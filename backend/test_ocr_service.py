@@ -0,0 +1,128 @@
+"""
+Tests for OCR queue slots when large pages are tiled
+"""
+
+import io
+import os
+os.environ.setdefault('GEMINI_API_KEY', 'test-key')
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+pytest.importorskip('pytesseract')
+from PIL import Image
+import ocr_service
+from config import Config
+from response_cache import ResponseCache
+
+
+def page_image(width=1700, height=2200):
+    buffer = io.BytesIO()
+    Image.new('L', (width, height), 255).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """An OCRService with 8 workers and a 16-job queue, tiling pages of 2 MP or more into
+    up to 2 tiles per worker; its pool runs stand-in layout and OCR jobs on threads"""
+    monkeypatch.setattr(Config, 'OCR_TILING', True)
+    monkeypatch.setattr(Config, 'OCR_TILE_MIN_PIXELS', 2_000_000)
+    monkeypatch.setattr(Config, 'OCR_TILES_PER_WORKER', 2)
+    monkeypatch.setattr(ocr_service.ocr_capabilities, '_capabilities',
+                        {'available': True, 'tesseract_cmd': 'tesseract', 'error': None})
+
+    svc = ocr_service.OCRService(workers=8, max_queue=16, timeout=5, cache=ResponseCache(max_entries=100))
+    peak = {'in_flight': 0}
+    lock = threading.Lock()
+
+    def fake_layout(image_bytes, profile, max_tiles):
+        svc.layouts.append(profile)
+        return [image_bytes[:16] + bytes([i]) for i in range(svc.blocks or max_tiles)]
+
+    def fake_ocr(image_bytes, lang, tesseract_config, timeout, tesseract_cmd, profile):
+        svc.ocr_profiles.append(profile)
+        with lock:
+            peak['in_flight'] = max(peak['in_flight'], svc._in_flight)
+        time.sleep(0.002)
+        return f"text {len(image_bytes)}"
+
+    monkeypatch.setattr(ocr_service, '_layout_tiles', fake_layout)
+    monkeypatch.setattr(ocr_service, '_run_ocr', fake_ocr)
+    svc._pool = ThreadPoolExecutor(max_workers=8)
+    svc.peak = peak
+    svc.blocks = None
+    svc.layouts = []
+    svc.ocr_profiles = []
+    yield svc
+    svc._pool.shutdown()
+
+
+def test_large_image_tiles_run_under_one_slot(service):
+    text = service.image_to_text(page_image())
+
+    stats = service.stats()
+    assert stats['submitted'] == 1
+    assert stats['tiled'] == 1
+    assert stats['tiles'] == 16
+    assert text.count("text") == 16
+
+
+def test_single_block_page_is_preprocessed_once(service):
+    service.blocks = 1
+
+    assert service.image_to_text(page_image())
+
+    assert service.layouts == ['default']
+    assert service.ocr_profiles == ['none']
+    assert service.stats()['tiled'] == 0
+
+
+def test_multi_page_batch_with_tiling_stays_within_the_queue(service):
+    pages = [page_image(1700, 2200 + i) for i in range(10)]
+
+    results = list(service.iter_images_to_text(pages))
+
+    assert sorted(index for index, _, _ in results) == list(range(10))
+    assert all(error is None for _, _, error in results)
+    stats = service.stats()
+    assert stats['rejected'] == 0
+    assert stats['submitted'] == 10
+    assert service.peak['in_flight'] <= service.workers
+
+
+def test_other_callers_still_get_a_slot_during_a_batch(service):
+    pages = [page_image(1700, 2200 + i) for i in range(10)]
+    batch = service.iter_images_to_text(pages)
+    next(batch)
+
+    assert service.image_to_text(page_image(1700, 2100))
+    list(batch)
+    assert service.stats()['rejected'] == 0
+
+
+def test_profiles_with_the_same_settings_share_a_cache_entry(service):
+    image = page_image(800, 600)
+
+    service.image_to_text(image, profile='default')
+    service.image_to_text(image, profile='educational')
+    service.image_to_text(image, profile='no-such-profile')
+
+    assert service.stats()['submitted'] == 1
+
+
+def test_batch_takes_pages_only_as_workers_free_up(service):
+    taken = []
+
+    def rendered_pages():
+        for i in range(30):
+            taken.append(i)
+            yield page_image(400, 300 + i)
+
+    batch = service.iter_images_to_text(rendered_pages())
+    first, _, _ = next(batch)
+
+    assert len(taken) <= service.workers
+    assert sorted([first] + [index for index, _, _ in batch]) == list(range(30))
@@ -0,0 +1,99 @@
+"""
+Tests for the quiz reply parsers and /api/generate-quiz/batch subject lists
+"""
+
+import json
+import pytest
+from quiz_parser import QuizArrayParser, parse_quiz_reply, parse_batch_subjects
+
+
+def question(text, answer=0):
+    return {"question": text, "options": ["A", "B", "C"], "correct_answer": answer, "explanation": "Because."}
+
+
+def test_brackets_braces_and_escaped_quotes_inside_strings():
+    tricky = question('Which is valid: "a[0]}" or {"x": ]}?')
+    tricky["explanation"] = 'The \\ escape and the "]}" are both just text'
+    reply = json.dumps([tricky, question("Second")])
+
+    questions, salvaged = parse_quiz_reply(reply)
+
+    assert questions == [tricky, question("Second")]
+    assert not salvaged
+
+
+def test_prose_before_the_array_is_skipped():
+    reply = "Here is your quiz {as requested}:\n" + json.dumps([question("One"), question("Two")])
+
+    questions, salvaged = parse_quiz_reply(reply)
+
+    assert [q["question"] for q in questions] == ["One", "Two"]
+    assert salvaged
+
+
+def test_truncated_final_object_is_dropped():
+    complete = json.dumps([question("One"), question("Two")])
+    reply = complete[:-1] + ', {"question": "Three", "options": ["A", "B'
+
+    questions, salvaged = parse_quiz_reply(reply)
+
+    assert [q["question"] for q in questions] == ["One", "Two"]
+    assert salvaged
+
+
+def test_streamed_chunks_yield_each_question_once_it_closes():
+    reply = json.dumps([question('Uses "]" and "}"'), question("Two")])
+    parser = QuizArrayParser()
+
+    emitted = []
+    for i in range(0, len(reply), 7):
+        emitted.append([q["question"] for q in parser.feed(reply[i:i + 7])])
+
+    assert [text for chunk in emitted for text in chunk] == ['Uses "]" and "}"', "Two"]
+    # Nothing is emitted before the first object's closing brace arrives
+    assert emitted[0] == []
+
+
+def test_invalid_objects_are_skipped_and_counted():
+    bad = {"question": "No options", "options": [], "correct_answer": 0, "explanation": ""}
+    parser = QuizArrayParser()
+
+    questions = parser.feed(json.dumps([bad, question("Good")]))
+
+    assert [q["question"] for q in questions] == ["Good"]
+    assert parser.skipped == 1
+
+
+def test_names_and_objects_are_accepted():
+    entries = ["Data Structures", {"subject": "Machine Learning", "count": 3}]
+    assert parse_batch_subjects(entries) == [("Data Structures", 5), ("Machine Learning", 3)]
+
+
+def test_counts_are_clamped():
+    entries = [{"subject": "A", "count": 0}, {"subject": "B", "count": 500}]
+    assert parse_batch_subjects(entries) == [("A", 1), ("B", 20)]
+
+
+@pytest.mark.parametrize("entries", [
+    None,
+    [],
+    "Data Structures",
+    [{"count": 3}],
+    [["x"]],
+    [None],
+    [42],
+    [""],
+    [{"subject": "   "}],
+    [{"subject": ["x"]}],
+    [{"subject": "A", "count": "3"}],
+    [{"subject": "A", "count": 2.5}],
+    [{"subject": "A", "count": True}],
+])
+def test_malformed_entries_are_rejected(entries):
+    with pytest.raises(ValueError):
+        parse_batch_subjects(entries)
+
+
+def test_error_names_the_bad_entry():
+    with pytest.raises(ValueError, match=r"subjects\[1\]"):
+        parse_batch_subjects(["A", {"count": 3}])
@@ -0,0 +1,76 @@
+"""
+Tests for keeping the transcript map step inside the upstream budget
+"""
+
+import os
+os.environ.setdefault('GEMINI_API_KEY', 'test-key')
+
+import pytest
+from response_cache import ResponseCache
+from transcript_summarizer import TranscriptSummarizer
+
+
+class Budget:
+    """In-memory stand-in for the shared upstream bucket"""
+
+    def __init__(self, calls):
+        self.calls = calls
+        self.reservations = []
+
+    def reserve(self, count):
+        self.reservations.append(count)
+        if count > self.calls:
+            raise RuntimeError("Rate limit exceeded")
+        self.calls -= count
+
+
+def long_transcript(windows, chunk_tokens=100):
+    # One caption per window, each just over chunk_tokens, so split() yields `windows` windows
+    text = "word " * (chunk_tokens * 4 // 5)
+    return [{'text': f"{i} {text}", 'start': i * 60.0, 'duration': 60.0} for i in range(windows)]
+
+
+def make_summarizer(budget, max_chunks, generated):
+    def generate(prompt):
+        generated.append(prompt)
+        return f"summary {len(generated)}"
+    return TranscriptSummarizer(generate, chunk_tokens=100, max_workers=4, max_chunks=max_chunks,
+                                cache=ResponseCache(max_entries=100), reserve=budget.reserve)
+
+
+def test_more_chunks_than_budget_are_merged_and_reserved_once():
+    budget = Budget(calls=10)
+    generated = []
+    summarizer = make_summarizer(budget, max_chunks=5, generated=generated)
+
+    prompt = summarizer.build_prompt(long_transcript(24))
+
+    assert budget.reservations == [5]
+    assert len(generated) == 5
+    assert budget.calls == 5
+    assert prompt.count("\nsummary ") == 5
+
+
+def test_insufficient_budget_fails_before_any_call():
+    budget = Budget(calls=3)
+    generated = []
+    summarizer = make_summarizer(budget, max_chunks=5, generated=generated)
+
+    with pytest.raises(RuntimeError):
+        summarizer.build_prompt(long_transcript(24))
+
+    assert generated == []
+    assert budget.calls == 3
+
+
+def test_cached_windows_are_not_reserved_again():
+    budget = Budget(calls=10)
+    generated = []
+    summarizer = make_summarizer(budget, max_chunks=5, generated=generated)
+    entries = long_transcript(24)
+
+    summarizer.build_prompt(entries)
+    summarizer.build_prompt(entries)
+
+    assert budget.reservations == [5]
+    assert len(generated) == 5
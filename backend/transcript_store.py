@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Persistent, compressed store of YouTube transcripts keyed by video id.
+
+Warm it with every lecture video in the course catalog so summaries of
+catalog videos never wait on YouTube:
+
+    python transcript_store.py --warm
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from youtube_transcript_api import YouTubeTranscriptApi
+from config import Config
+from single_flight import SingleFlight
+
+
+def extract_video_id(url):
+    match = re.search(r"(?:v=|\/)([0-9A-Za-z_-]{11}).*", url)
+    return match.group(1) if match else None
+
+
+class TranscriptStore:
+    """SQLite-backed transcript store.
+
+    Each transcript is stored once as zlib-compressed JSON caption entries.
+    Every gunicorn worker opens the same file, and concurrent misses for one
+    video share a single YouTube download.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or Config.TRANSCRIPT_DB
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.init_database()
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def init_database(self):
+        """Create the transcripts table if it doesn't exist"""
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        conn = self.get_connection()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    video_id TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    entries INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get(self, video_id: str):
+        """Return the stored caption entries for video_id, or None"""
+        try:
+            conn = self.get_connection()
+            try:
+                row = conn.execute('SELECT data FROM transcripts WHERE video_id = ?', (video_id,)).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Transcript store read error: {e}")
+            return None
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def put(self, video_id: str, entries):
+        """Store caption entries for video_id"""
+        data = zlib.compress(json.dumps(entries, separators=(',', ':')).encode('utf-8'), 9)
+        try:
+            conn = self.get_connection()
+            try:
+                conn.execute(
+                    'INSERT OR REPLACE INTO transcripts (video_id, data, entries, fetched_at) VALUES (?, ?, ?, ?)',
+                    (video_id, data, len(entries), time.time())
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Transcript store write error: {e}")
+
+    def get_transcript(self, video_id: str):
+        """Return the transcript for video_id, downloading and storing it on a miss"""
+        entries = self.get(video_id)
+        with self._lock:
+            if entries is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entries is not None:
+            return entries
+        return self._flight.do(video_id, lambda: self._download(video_id))
+
+    def _download(self, video_id):
+        entries = YouTubeTranscriptApi.get_transcript(video_id)
+        entries = [{'text': e['text'], 'start': e['start'], 'duration': e.get('duration', 0)} for e in entries]
+        self.put(video_id, entries)
+        return entries
+
+    def warm(self, urls, workers: int = 4):
+        """Download every video in urls that isn't stored yet; returns (fetched, stored, failed)"""
+        video_ids = {extract_video_id(url) for url in urls if url}
+        video_ids.discard(None)
+        missing = [video_id for video_id in sorted(video_ids) if self.get(video_id) is None]
+
+        failed = []
+
+        def fetch(video_id):
+            try:
+                self._download(video_id)
+                print(f"✅ {video_id}")
+            except Exception as e:
+                failed.append(video_id)
+                print(f"❌ {video_id}: {e}")
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(fetch, missing))
+        return len(missing) - len(failed), len(video_ids) - len(missing), failed
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for the metrics endpoint"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+def catalog_video_urls(course_data_path):
+    """Every topic videoUrl in course_data.json"""
+    with open(course_data_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return [topic.get('videoUrl') for subject in data for topic in subject.get('topics', [])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the on-disk YouTube transcript store")
+    parser.add_argument('--warm', action='store_true', help="prefetch transcripts for every catalog video")
+    parser.add_argument('--course-data', default=os.path.join(os.path.dirname(__file__), 'course_data.json'))
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    store = TranscriptStore()
+    if not args.warm:
+        parser.print_help()
+        return
+
+    print(f"🎬 Warming transcript store at {store.db_path}")
+    fetched, stored, failed = store.warm(catalog_video_urls(args.course_data), args.workers)
+    print(f"\n📦 {fetched} downloaded, {stored} already stored, {len(failed)} failed")
+
+
+if __name__ == "__main__":
+    main()
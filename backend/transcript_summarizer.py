@@ -0,0 +1,150 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from response_cache import ResponseCache
+from usage_tracker import usage_tracker
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English captions)"""
+    return max(1, len(text) // 4)
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class TranscriptSummarizer:
+    """Map-reduce summarization of long video transcripts.
+
+    The transcript is split on caption boundaries into windows of at most
+    chunk_tokens. Each window is summarized on a bounded thread pool (the map
+    step) and the section summaries are cached per chunk text, so asking for
+    the same video again, or with a different action, only pays for the
+    windows it hasn't seen. build_prompt() returns the reduce prompt, which
+    the caller sends through its normal cached / streamed Gemini path.
+
+    Every map call is an upstream call, so the windows are merged down to
+    max_chunks (kept below the upstream budget) and, when a reserve callable
+    is given, the calls for all uncached windows are taken from the budget
+    in one go before any is made: a long video either gets its whole map
+    step or fails fast, instead of draining the budget and failing halfway.
+    """
+
+    MAP_PROMPT = ("Summarize the key learning points of this section of a lecture video "
+                  "({start} - {end}) in a few concise bullet points:\n\n{text}")
+    REDUCE_PROMPT = ("Below are summaries of consecutive sections of a lecture video. "
+                     "Combine them into one summary of the key learning points of the whole video:\n\n{sections}")
+    SINGLE_PROMPT = "Summarize the key learning points of this video:\n\n{text}"
+
+    def __init__(self, generate, chunk_tokens: int = None, max_workers: int = None,
+                 max_chunks: int = None, cache: ResponseCache = None, reserve=None, cache_scope: str = None):
+        """
+        generate: callable(prompt) -> reply text; raises on failure
+        reserve: optional callable(count) taking count upstream calls at once; raises when it can't
+        cache_scope: the models generate may use, part of each chunk's cache key
+        """
+        self.generate = generate
+        self.cache_scope = cache_scope or Config.GEMINI_MODEL
+        self.reserve = reserve
+        self.chunk_tokens = chunk_tokens or Config.TRANSCRIPT_CHUNK_TOKENS
+        self.max_chunks = max_chunks or Config.TRANSCRIPT_MAX_CHUNKS
+        self.cache = cache or ResponseCache(ttl=Config.TRANSCRIPT_CHUNK_TTL,
+                                            db_path=Config.RESPONSE_CACHE_DB or None,
+                                            table='transcript_chunks')
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or Config.TRANSCRIPT_MAP_WORKERS,
+                                        thread_name_prefix='transcript-map')
+        self._lock = threading.Lock()
+        self.chunks_summarized = 0
+        self.chunks_from_cache = 0
+
+    def split(self, entries):
+        """Group caption entries into (start, end, text) windows of at most chunk_tokens"""
+        windows = []
+        texts, tokens, start, end = [], 0, 0.0, 0.0
+        for entry in entries:
+            text = entry.get('text', '').replace('\n', ' ').strip()
+            if not text:
+                continue
+            entry_tokens = estimate_tokens(text)
+            if texts and tokens + entry_tokens > self.chunk_tokens:
+                windows.append((start, end, " ".join(texts)))
+                texts, tokens = [], 0
+            if not texts:
+                start = entry.get('start', end)
+            texts.append(text)
+            tokens += entry_tokens
+            end = entry.get('start', end) + entry.get('duration', 0)
+        if texts:
+            windows.append((start, end, " ".join(texts)))
+        return windows
+
+    def window_prompt(self, window):
+        """Return (map prompt, cache key) for a window"""
+        start, end, text = window
+        prompt = self.MAP_PROMPT.format(start=format_timestamp(start), end=format_timestamp(end), text=text)
+        return prompt, self.cache.make_key(prompt, self.cache_scope)
+
+    def summarize_window(self, window):
+        """Map step for one window, served from the chunk cache when possible"""
+        prompt, key = self.window_prompt(window)
+        summary = self.cache.get(key)
+        if summary is not None:
+            with self._lock:
+                self.chunks_from_cache += 1
+            return summary
+        summary = self.generate(prompt)
+        self.cache.set(key, summary)
+        with self._lock:
+            self.chunks_summarized += 1
+        return summary
+
+    def build_prompt(self, entries) -> str:
+        """Return the prompt that summarizes the whole transcript.
+
+        Short transcripts are sent in one prompt; longer ones are reduced to
+        their section summaries first.
+        """
+        windows = self.split(entries)
+        if not windows:
+            raise ValueError("The transcript is empty.")
+        if len(windows) == 1:
+            return self.SINGLE_PROMPT.format(text=windows[0][2])
+        if len(windows) > self.max_chunks:
+            # Merge neighbours rather than truncating, so the whole video is still covered
+            group = -(-len(windows) // self.max_chunks)
+            windows = [(windows[i][0], windows[min(i + group, len(windows)) - 1][1],
+                        " ".join(w[2] for w in windows[i:i + group]))
+                       for i in range(0, len(windows), group)]
+
+        if self.reserve is not None:
+            uncached = sum(1 for window in windows if self.cache.get(self.window_prompt(window)[1]) is None)
+            if uncached:
+                self.reserve(uncached)
+
+        # Map threads don't see the request, so carry its route and user over for usage accounting
+        labels = usage_tracker.current_labels()
+
+        def summarize_labelled(window):
+            with usage_tracker.labels(**labels):
+                return self.summarize_window(window)
+
+        summaries = list(self._pool.map(summarize_labelled, windows))
+        sections = "\n\n".join(f"[{format_timestamp(start)} - {format_timestamp(end)}]\n{summary}"
+                               for (start, end, _), summary in zip(windows, summaries))
+        return self.REDUCE_PROMPT.format(sections=sections)
+
+    def stats(self) -> dict:
+        """Return map-step counters for the metrics endpoint"""
+        with self._lock:
+            return {
+                'chunks_summarized': self.chunks_summarized,
+                'chunks_from_cache': self.chunks_from_cache,
+                'chunk_tokens': self.chunk_tokens,
+                'chunk_cache': self.cache.stats()
+            }
@@ -0,0 +1,184 @@
+import heapq
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, InvalidStateError
+from config import Config
+
+
+class RetryBudget:
+    """Global retry allowance shared by every upstream call.
+
+    Each first attempt deposits `ratio` tokens and each retry spends one, so
+    retries can never exceed roughly `ratio` of the traffic. When Gemini is
+    throttling us this stops a burst of 429s from multiplying into a retry
+    storm.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            return self._tokens
+
+
+class _Task:
+    def __init__(self, fn, future, retry_on):
+        self.fn = fn
+        self.future = future
+        self.retry_on = retry_on
+        self.attempt = 0
+
+
+class UpstreamExecutor:
+    """Run upstream calls on a bounded worker pool with timer-scheduled retries.
+
+    A failed attempt is not retried by sleeping in a thread: it is put on a
+    timer heap with jittered exponential backoff, and a single scheduler
+    thread hands it back to the pool when it is due. No worker or request
+    thread is held while a retry waits.
+    """
+
+    def __init__(self, max_workers: int = None, max_attempts: int = None, backoff_base: float = None,
+                 max_backoff: float = None, retry_ratio: float = None, retry_budget_max: float = None):
+        self.max_attempts = max_attempts or Config.GEMINI_MAX_RETRIES
+        self.backoff_base = backoff_base or Config.GEMINI_BACKOFF_BASE
+        self.max_backoff = max_backoff or Config.GEMINI_MAX_BACKOFF
+        self.budget = RetryBudget(
+            retry_ratio if retry_ratio is not None else Config.RETRY_BUDGET_RATIO,
+            retry_budget_max or Config.RETRY_BUDGET_MAX
+        )
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or Config.UPSTREAM_WORKERS,
+                                        thread_name_prefix='upstream')
+        self._timers = []
+        self._timer_seq = 0
+        self._cond = threading.Condition()
+        self._scheduler = None
+        self._stats_lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.submitted = 0
+        self.retries_scheduled = 0
+        self.retries_denied = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    def submit(self, fn, retry_on=(Exception,)) -> Future:
+        """Run fn() upstream, retrying exceptions in retry_on; returns a Future"""
+        future = Future()
+        task = _Task(fn, future, retry_on)
+        with self._stats_lock:
+            self.submitted += 1
+        self.budget.deposit()
+        self._dispatch(task)
+        return future
+
+    def _dispatch(self, task):
+        with self._stats_lock:
+            self.queued += 1
+        self._pool.submit(self._run, task)
+
+    def _run(self, task):
+        with self._stats_lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            # The caller gave up (deadline passed); drop the attempt
+            if task.future.cancelled():
+                return
+            task.attempt += 1
+            try:
+                result = task.fn()
+            except task.retry_on as e:
+                if task.attempt < self.max_attempts and self.budget.try_withdraw():
+                    with self._stats_lock:
+                        self.retries_scheduled += 1
+                    self._schedule(task, self._backoff(task.attempt))
+                    return
+                if task.attempt < self.max_attempts:
+                    with self._stats_lock:
+                        self.retries_denied += 1
+                self._finish(task, error=e)
+            except Exception as e:
+                self._finish(task, error=e)
+            else:
+                self._finish(task, result=result)
+        finally:
+            with self._stats_lock:
+                self.running -= 1
+
+    def _finish(self, task, result=None, error=None):
+        try:
+            if error is not None:
+                task.future.set_exception(error)
+            else:
+                task.future.set_result(result)
+        except InvalidStateError:
+            return
+        with self._stats_lock:
+            if error is not None:
+                self.failed += 1
+            else:
+                self.succeeded += 1
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff (2s, 4s, 8s by default) with jitter, capped at max_backoff"""
+        delay = min(self.max_backoff, self.backoff_base ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def _schedule(self, task, delay):
+        with self._cond:
+            self._timer_seq += 1
+            heapq.heappush(self._timers, (time.monotonic() + delay, self._timer_seq, task))
+            if self._scheduler is None or not self._scheduler.is_alive():
+                self._scheduler = threading.Thread(target=self._run_scheduler, name='upstream-retry-scheduler',
+                                                   daemon=True)
+                self._scheduler.start()
+            self._cond.notify()
+
+    def _run_scheduler(self):
+        while True:
+            with self._cond:
+                while not self._timers:
+                    self._cond.wait()
+                due_at, _, task = self._timers[0]
+                wait = due_at - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._timers)
+            self._dispatch(task)
+
+    def stats(self) -> dict:
+        """Return queue depth and retry counters for the metrics endpoint"""
+        with self._cond:
+            pending_retries = len(self._timers)
+        with self._stats_lock:
+            return {
+                'queue_depth': self.queued,
+                'running': self.running,
+                'pending_retries': pending_retries,
+                'submitted': self.submitted,
+                'succeeded': self.succeeded,
+                'failed': self.failed,
+                'retries_scheduled': self.retries_scheduled,
+                'retries_denied_by_budget': self.retries_denied,
+                'retry_budget_tokens': round(self.budget.tokens, 2)
+            }
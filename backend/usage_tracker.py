@@ -0,0 +1,119 @@
+import contextvars
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from flask import has_request_context, request
+from config import Config
+from rate_limiter import get_client_identity
+
+_labels = contextvars.ContextVar('gemini_usage_labels', default=None)
+
+
+def _new_bucket():
+    return {
+        'calls': 0,
+        'errors': 0,
+        'retries': 0,
+        'prompt_chars': 0,
+        'response_chars': 0,
+        'prompt_tokens': 0,
+        'output_tokens': 0,
+        'total_tokens': 0,
+        'latency_seconds': 0.0
+    }
+
+
+class UsageTracker:
+    """Per-call accounting of what every Gemini call spends.
+
+    Each call is recorded with its prompt and response size, the token counts
+    from usageMetadata, latency and retries, and aggregated per route
+    (route:action, which maps to a prompt template), per user and per
+    endpoint. Counters are kept per worker process; at most max_users users
+    are tracked (least recently active go first).
+    """
+
+    def __init__(self, max_users: int = None):
+        self.max_users = max_users or Config.USAGE_MAX_USERS
+        self._lock = threading.Lock()
+        self.totals = _new_bucket()
+        self.by_route = {}
+        self.by_endpoint = {}
+        self.by_user = OrderedDict()
+
+    @staticmethod
+    def current_labels() -> dict:
+        """Route and user for calls made from this thread"""
+        labels = _labels.get()
+        if labels is not None:
+            return labels
+        if has_request_context():
+            return {'route': request.endpoint or request.path, 'user': get_client_identity()}
+        return {'route': 'background', 'user': None}
+
+    @staticmethod
+    @contextmanager
+    def labels(route: str = None, user: str = None):
+        """Attribute calls made inside the block to route and user (for work off the request thread)"""
+        token = _labels.set({'route': route or 'background', 'user': user})
+        try:
+            yield
+        finally:
+            _labels.reset(token)
+
+    def record(self, labels: dict, task: str, endpoint: str, prompt_chars: int, response_chars: int,
+               usage: dict, latency: float, retries: int, ok: bool):
+        """Add one Gemini call to the aggregates"""
+        usage = usage or {}
+        route = labels.get('route') or 'unknown'
+        route_key = f"{route}:{task}" if task else route
+        user = labels.get('user') or 'anonymous'
+        with self._lock:
+            if user not in self.by_user:
+                self.by_user[user] = _new_bucket()
+                while len(self.by_user) > self.max_users:
+                    self.by_user.popitem(last=False)
+            self.by_user.move_to_end(user)
+            buckets = (
+                self.totals,
+                self.by_route.setdefault(route_key, _new_bucket()),
+                self.by_endpoint.setdefault(endpoint or 'none', _new_bucket()),
+                self.by_user[user]
+            )
+            for bucket in buckets:
+                bucket['calls'] += 1
+                bucket['errors'] += 0 if ok else 1
+                bucket['retries'] += retries
+                bucket['prompt_chars'] += prompt_chars
+                bucket['response_chars'] += response_chars
+                bucket['prompt_tokens'] += usage.get('promptTokenCount', 0)
+                bucket['output_tokens'] += usage.get('candidatesTokenCount', 0)
+                bucket['total_tokens'] += usage.get('totalTokenCount', 0)
+                bucket['latency_seconds'] += latency
+
+    @staticmethod
+    def _summarize(bucket):
+        calls = bucket['calls']
+        cost = (bucket['prompt_tokens'] * Config.GEMINI_INPUT_PRICE_PER_M
+                + bucket['output_tokens'] * Config.GEMINI_OUTPUT_PRICE_PER_M) / 1_000_000
+        return dict(bucket,
+                    latency_seconds=round(bucket['latency_seconds'], 3),
+                    avg_latency=round(bucket['latency_seconds'] / calls, 3) if calls else None,
+                    avg_prompt_tokens=round(bucket['prompt_tokens'] / calls, 1) if calls else None,
+                    estimated_cost_usd=round(cost, 6))
+
+    def stats(self, top_users: int = 20) -> dict:
+        """Return aggregates for the metrics endpoint, routes sorted by total tokens"""
+        with self._lock:
+            routes = sorted(self.by_route.items(), key=lambda item: item[1]['total_tokens'], reverse=True)
+            users = sorted(self.by_user.items(), key=lambda item: item[1]['total_tokens'], reverse=True)
+            return {
+                'totals': self._summarize(self.totals),
+                'by_route': {name: self._summarize(bucket) for name, bucket in routes},
+                'by_endpoint': {name: self._summarize(bucket) for name, bucket in self.by_endpoint.items()},
+                'by_user': {name: self._summarize(bucket) for name, bucket in users[:top_users]},
+                'users_tracked': len(self.by_user)
+            }
+
+
+usage_tracker = UsageTracker()
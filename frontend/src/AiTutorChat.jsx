@@ -418,74 +418,96 @@ export default function AiTutorChat({ token }) {
 
     // Handle image upload
     if (action === 'image' && imageFile) {
-      const reader = new FileReader();
-      reader.onloadend = async () => {
-        const base64String = reader.result;
-        try {
-          // Use the dedicated analyze-image route for better OCR processing
-          const res = await fetch('https://ai-tutor-backend-m4rr.onrender.com/analyze-image', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json', ...(token && { Authorization: `Bearer ${token}` }) },
-            body: JSON.stringify({ 
-              image: base64String, 
-              analysis_type: 'educational' 
-            })
-          });
-          
-          if (!res.ok) {
-            throw new Error(`HTTP error! status: ${res.status}`);
-          }
-          
-          const contentType = res.headers.get('content-type');
-          let data;
-          if (contentType && contentType.includes('application/json')) {
-            data = await res.json();
-          } else {
-            const text = await res.text();
-            throw new Error('Non-JSON response: ' + text);
-          }
-          
-          if (data.error) {
-            throw new Error(data.error);
-          }
-          
-          setMessages(msgs => [...msgs, { from: 'ai', text: data.analysis, action }]);
-        } catch (err) {
-          console.error('Image processing error:', err);
-          setMessages(msgs => [...msgs, { from: 'ai', text: `Error processing image: ${err.message}`, action }]);
-        } finally {
-          setQuestion('');
-          setImageFile(null);
-          setImagePreview(null);
-          setLoading(false);
+      try {
+        // Send the file itself as multipart form data instead of a base64 data URL in JSON
+        const formData = new FormData();
+        formData.append('image', imageFile);
+        formData.append('analysis_type', 'educational');
+
+        // Use the dedicated analyze-image route for better OCR processing
+        const res = await fetch('https://ai-tutor-backend-m4rr.onrender.com/analyze-image', {
+          method: 'POST',
+          headers: { ...(token && { Authorization: `Bearer ${token}` }) },
+          body: formData
+        });
+
+        if (!res.ok) {
+          throw new Error(`HTTP error! status: ${res.status}`);
         }
-      };
-      reader.readAsDataURL(imageFile);
+
+        const contentType = res.headers.get('content-type');
+        let data;
+        if (contentType && contentType.includes('application/json')) {
+          data = await res.json();
+        } else {
+          const text = await res.text();
+          throw new Error('Non-JSON response: ' + text);
+        }
+
+        if (data.error) {
+          throw new Error(data.error);
+        }
+
+        setMessages(msgs => [...msgs, { from: 'ai', text: data.analysis, action }]);
+      } catch (err) {
+        console.error('Image processing error:', err);
+        setMessages(msgs => [...msgs, { from: 'ai', text: `Error processing image: ${err.message}`, action }]);
+      } finally {
+        setQuestion('');
+        setImageFile(null);
+        setImagePreview(null);
+        setLoading(false);
+      }
       return;
     }
 
     // Handle text-based actions
     try {
-      const res = await fetch('https://ai-tutor-backend-m4rr.onrender.com/chat', {
+      const res = await fetch('https://ai-tutor-backend-m4rr.onrender.com/chat/stream', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json', ...(token && { Authorization: `Bearer ${token}` }) },
+        headers: {
+          'Content-Type': 'application/json',
+          Accept: 'text/event-stream',
+          ...(token && { Authorization: `Bearer ${token}` })
+        },
         body: JSON.stringify({ message: question, action })
       });
-      
+
       if (!res.ok) {
         throw new Error(`HTTP error! status: ${res.status}`);
       }
-      
-      const contentType = res.headers.get('content-type');
-      let data;
-      if (contentType && contentType.includes('application/json')) {
-        data = await res.json();
-      } else {
-        const text = await res.text();
-        throw new Error('Non-JSON response: ' + text);
+
+      // Render the reply as server-sent events arrive instead of waiting for the whole answer
+      setMessages(msgs => [...msgs, { from: 'ai', text: '', action }]);
+      const updateReply = text => setMessages(msgs => {
+        const next = [...msgs];
+        next[next.length - 1] = { ...next[next.length - 1], text };
+        return next;
+      });
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let reply = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const rawEvent of events) {
+          let event = 'message';
+          let data = '';
+          for (const line of rawEvent.split('\n')) {
+            if (line.startsWith('event:')) event = line.slice(6).trim();
+            else if (line.startsWith('data:')) data += line.slice(5).trim();
+          }
+          if (!data) continue;
+          const payload = JSON.parse(data);
+          reply = event === 'message' ? reply + payload.text : payload.reply;
+          updateReply(reply);
+        }
       }
-      
-      setMessages(msgs => [...msgs, { from: 'ai', text: data.reply, action }]);
     } catch (err) {
       console.error('Chat error:', err);
       setMessages(msgs => [...msgs, { from: 'ai', text: `Error: ${err.message}`, action }]);
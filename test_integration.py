@@ -7,6 +7,11 @@ import requests
 import base64
 import json
 import os
+import sys
+import time
+import argparse
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 
 # Test configuration
 BASE_URL = "http://127.0.0.1:5000"
@@ -143,5 +148,143 @@ def main():
         print("2. Verify the server is running on the correct port")
         print("3. Check server logs for detailed error messages")
 
+# ---------------------------------------------------------------------------
+# LLM-path load benchmark
+#
+# Run against a backend pointed at the local Gemini stand-in so no quota is spent:
+#   python backend/mock_gemini_server.py --latency lognormal:1.0,0.4 --error-429 0.02
+#   cd backend && GEMINI_API_BASE=http://127.0.0.1:8089/v1beta \
+#       USER_RATE_LIMIT_CAPACITY=100000 UPSTREAM_RATE_LIMIT_CALLS=100000 gunicorn app:app -b 127.0.0.1:5000
+#   python test_integration.py --bench --concurrency 16 --requests 400
+# ---------------------------------------------------------------------------
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+def make_test_image_base64(text="Solve 2x + 3 = 11"):
+    """Render a small PNG with text for the image routes"""
+    from PIL import Image, ImageDraw
+    import io
+    img = Image.new('RGB', (400, 120), color='white')
+    ImageDraw.Draw(img).text((20, 40), text, fill='black')
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+def build_llm_requests(unique_prompts):
+    """Return a dict of route name -> callable(session, n) issuing one request"""
+    try:
+        subjects = requests.get(f"{BASE_URL}/api/subjects", timeout=10).json() or ["Data Structures"]
+    except Exception:
+        subjects = ["Data Structures"]
+    try:
+        image = make_test_image_base64()
+    except ImportError:
+        image = None
+
+    def suffix(n):
+        return f" (variant {n})" if unique_prompts else ""
+
+    def chat(session, n):
+        action = ["default", "code", "diagram", "quiz"][n % 4]
+        return session.post(f"{BASE_URL}/chat", json={"message": f"Explain binary search trees{suffix(n)}", "action": action}, timeout=120)
+
+    def chat_stream(session, n):
+        response = session.post(f"{BASE_URL}/chat/stream", json={"message": f"Explain hash tables{suffix(n)}", "action": "code"},
+                                headers={"Accept": "text/event-stream"}, stream=True, timeout=120)
+        first_event = None
+        for line in response.iter_lines():
+            if line and first_event is None:
+                first_event = time.perf_counter()
+        response.first_event_at = first_event
+        return response
+
+    def upload_image(session, n):
+        return session.post(f"{BASE_URL}/upload-image", json={"image": image}, timeout=120)
+
+    def generate_quiz(session, n):
+        return session.get(f"{BASE_URL}/api/generate-quiz/{subjects[n % len(subjects)]}", timeout=120)
+
+    routes = {"chat": chat, "chat/stream": chat_stream, "generate-quiz": generate_quiz}
+    if image:
+        routes["upload-image"] = upload_image
+    return routes
+
+def benchmark_llm_routes(concurrency=8, total_requests=100, unique_prompts=False, only=None):
+    """Drive the LLM routes at fixed concurrency and report throughput and latency percentiles"""
+    print(f"\n⏱️ Benchmarking LLM routes at {BASE_URL} (concurrency={concurrency}, requests/route={total_requests})")
+    routes = build_llm_requests(unique_prompts)
+    if only:
+        routes = {name: fn for name, fn in routes.items() if name in only}
+
+    results = {}
+    for name, issue in routes.items():
+        session = requests.Session()
+        session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+        latencies, first_event_latencies, statuses = [], [], {}
+        counter = itertools.count()
+
+        def one_request(_):
+            n = next(counter)
+            started = time.perf_counter()
+            try:
+                response = issue(session, n)
+                status = response.status_code
+                first_event_at = getattr(response, 'first_event_at', None)
+                if first_event_at:
+                    first_event_latencies.append(first_event_at - started)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one_request, range(total_requests)))
+        elapsed = time.perf_counter() - started
+
+        results[name] = {
+            "throughput_rps": round(total_requests / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "statuses": statuses
+        }
+        if first_event_latencies:
+            results[name]["ttft_p50_ms"] = round(percentile(first_event_latencies, 50) * 1000, 1)
+            results[name]["ttft_p95_ms"] = round(percentile(first_event_latencies, 95) * 1000, 1)
+
+    print(f"{'route':<16}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  statuses")
+    for name, row in results.items():
+        print(f"{name:<16}{row['throughput_rps']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}  {row['statuses']}")
+        if 'ttft_p50_ms' in row:
+            print(f"{'':<16}time to first event: p50 {row['ttft_p50_ms']} ms, p95 {row['ttft_p95_ms']} ms")
+
+    try:
+        metrics = requests.get(f"{BASE_URL}/api/metrics", timeout=10).json()
+        print("\n📈 Backend metrics:")
+        print(json.dumps(metrics, indent=2))
+    except Exception as e:
+        print(f"Could not fetch /api/metrics: {e}")
+    return results
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="AI Tutor integration tests and LLM-path benchmark")
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--bench', action='store_true', help="run the LLM route load benchmark")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=100, help="requests per route")
+    parser.add_argument('--unique-prompts', action='store_true', help="vary prompts to bypass the response cache")
+    parser.add_argument('--routes', nargs='*', help="limit the benchmark to these routes")
+    args = parser.parse_args()
+    BASE_URL = args.base_url.rstrip('/')
+
+    if args.bench:
+        benchmark_llm_routes(args.concurrency, args.requests, args.unique_prompts, args.routes)
+        sys.exit(0)
+    main()